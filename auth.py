@@ -1,21 +1,237 @@
-from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, NamedTuple, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, joinedload
+from config import settings
 from database import get_db
-from models import User
+from invalidation import invalidation_bus
+from models import User, UserRole, RefreshToken
 
-SECRET_KEY = "your-secret-key-here-change-in-production"
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+REFRESH_TOKEN_EXPIRE_DAYS = settings.refresh_token_expire_days
+REFRESH_TOKEN_MAX_LIFETIME_DAYS = settings.refresh_token_max_lifetime_days
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+IDENTITY_ATTRIBUTES = ("username", "full_name", "role")
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+password_executor = ThreadPoolExecutor(max_workers=settings.password_hash_workers, thread_name_prefix="password-hash")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+class Principal(NamedTuple):
+    id: int
+    username: str
+    full_name: str
+    role: UserRole
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, username=user.username, full_name=user.full_name, role=user.role)
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        try:
+            return cls(
+                id=int(payload["uid"]),
+                username=payload["sub"],
+                full_name=payload.get("name") or "",
+                role=UserRole(payload["role"])
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def claims(self, session_id: Optional[int] = None) -> dict:
+        claims = {"sub": self.username, "uid": self.id, "role": self.role.value, "name": self.full_name}
+        if session_id is not None:
+            claims["sid"] = session_id
+        return claims
+
+
+class PrincipalCache:
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[Principal, float]] = {}
+        self._changed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[Principal]:
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(username, None)
+            return None
+        return principal
+
+    def set(self, principal: Principal):
+        with self._lock:
+            self._entries[principal.username] = (principal, time.monotonic() + self.ttl_seconds)
+
+    def claims_are_fresh(self, username: str, issued_at) -> bool:
+        changed_at = self._changed_at.get(username)
+        return changed_at is None or (issued_at is not None and issued_at >= changed_at)
+
+    def invalidate(self, username: str, connection=None):
+        changed_at = self.invalidate_local(username)
+        invalidation_bus.publish("principal", f"{changed_at}:{username}", connection)
+
+    def invalidate_local(self, username: str, changed_at: Optional[float] = None) -> float:
+        changed_at = changed_at if changed_at is not None else time.time()
+        with self._lock:
+            self._entries.pop(username, None)
+            self._changed_at[username] = max(changed_at, self._changed_at.get(username, 0))
+        return changed_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache(settings.principal_cache_ttl_seconds)
+
+
+def apply_principal_event(payload: str):
+    changed_at, username = payload.split(":", 1)
+    principal_cache.invalidate_local(username, float(changed_at))
+
+
+invalidation_bus.subscribe("principal", apply_principal_event)
+
+
+class RevokedSessions:
+
+    def __init__(self, retention_seconds: int):
+        self.retention_seconds = retention_seconds
+        self._revoked: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id) -> bool:
+        revoked_at = self._revoked.get(session_id)
+        if revoked_at is None:
+            return False
+        if revoked_at + self.retention_seconds < time.time():
+            self._revoked.pop(session_id, None)
+            return False
+        return True
+
+    def add(self, session_id: int, revoked_at: Optional[float] = None):
+        revoked_at = revoked_at if revoked_at is not None else time.time()
+        self.add_local(session_id, revoked_at)
+        invalidation_bus.publish("revoked_session", f"{session_id}:{revoked_at}")
+
+    def add_local(self, session_id: int, revoked_at: float):
+        with self._lock:
+            self._revoked[session_id] = revoked_at
+
+    def load(self, db: Session):
+        since = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        rows = db.query(RefreshToken.id, RefreshToken.revoked_at).filter(RefreshToken.revoked_at >= since).all()
+        with self._lock:
+            for session_id, revoked_at in rows:
+                self._revoked[session_id] = revoked_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+revoked_sessions = RevokedSessions(ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+
+def apply_revoked_session_event(payload: str):
+    session_id, revoked_at = payload.split(":")
+    revoked_sessions.add_local(int(session_id), float(revoked_at))
+
+
+invalidation_bus.subscribe("revoked_session", apply_revoked_session_event)
+
+
+class LoginRateLimiter:
+
+    def __init__(self, window_seconds: int, max_failures_per_user: int, max_failures_per_ip: int,
+                 max_keys: int):
+        self.window_seconds = window_seconds
+        self.max_failures_per_user = max_failures_per_user
+        self.max_failures_per_ip = max_failures_per_ip
+        self.max_keys = max_keys
+        # Ordered by last failure, so expired keys and eviction candidates are always at the front.
+        self._failures: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key: str, now: float) -> Deque[float]:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def retry_after(self, username: str, client_ip: str) -> int:
+        now = time.monotonic()
+        with self._lock:
+            wait = 0
+            for key, limit in ((f"user:{username.lower()}", self.max_failures_per_user),
+                               (f"ip:{client_ip}", self.max_failures_per_ip)):
+                failures = self._recent(key, now)
+                if len(failures) >= limit:
+                    wait = max(wait, int(failures[0] + self.window_seconds - now) + 1)
+            return wait
+
+    def record_failure(self, username: str, client_ip: str):
+        now = time.monotonic()
+        with self._lock:
+            for key in (f"user:{username.lower()}", f"ip:{client_ip}"):
+                self._failures.setdefault(key, deque()).append(now)
+                self._failures.move_to_end(key)
+            # Sprayed usernames are never queried again, so they are dropped here rather than in _recent.
+            while self._failures:
+                failures = next(iter(self._failures.values()))
+                if failures[-1] > now - self.window_seconds and len(self._failures) <= self.max_keys:
+                    break
+                self._failures.popitem(last=False)
+
+    def reset(self, username: str):
+        with self._lock:
+            self._failures.pop(f"user:{username.lower()}", None)
+
+
+login_limiter = LoginRateLimiter(
+    settings.login_failure_window_seconds,
+    settings.login_max_failures_per_user,
+    settings.login_max_failures_per_ip,
+    settings.login_failure_max_keys
+)
+
+
+@event.listens_for(User, "after_update")
+def invalidate_updated_user_principal(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in IDENTITY_ATTRIBUTES):
+        return
+    for username in {target.username, *(state.attrs.username.history.deleted or ())}:
+        if username:
+            principal_cache.invalidate(username, connection)
+
+
+@event.listens_for(User, "after_delete")
+def invalidate_deleted_user_principal(mapper, connection, target):
+    principal_cache.invalidate(target.username, connection)
+
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -28,23 +244,82 @@ def authenticate_user(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = pwd_context.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
     return user
 
 
+async def authenticate_user_async(db: Session, username: str, password: str):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, authenticate_user, db, username, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=15)
+    to_encode.update({"exp": expire, "iat": int(time.time())})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def hash_refresh_token(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def issue_refresh_token(db: Session, user: User) -> Tuple[str, RefreshToken]:
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    refresh_token = RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(token),
+        created_at=now,
+        last_used_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    )
+    db.add(refresh_token)
+    db.commit()
+    db.refresh(refresh_token)
+    return token, refresh_token
+
+
+def use_refresh_token(db: Session, token: str) -> Optional[RefreshToken]:
+    refresh_token = db.query(RefreshToken).options(joinedload(RefreshToken.user)).filter(
+        RefreshToken.token_hash == hash_refresh_token(token)
+    ).first()
+    now = datetime.utcnow()
+    if (not refresh_token or refresh_token.revoked_at is not None
+            or refresh_token.expires_at < now or refresh_token.user is None):
+        return None
+
+    refresh_token.last_used_at = now
+    refresh_token.expires_at = min(
+        now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        refresh_token.created_at + timedelta(days=REFRESH_TOKEN_MAX_LIFETIME_DAYS)
+    )
+    db.commit()
+    return refresh_token
+
+
+def revoke_refresh_token(db: Session, token: str) -> bool:
+    refresh_token = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_refresh_token(token)).first()
+    if not refresh_token:
+        return False
+    if refresh_token.revoked_at is None:
+        refresh_token.revoked_at = datetime.utcnow()
+        db.commit()
+    revoked_sessions.add(refresh_token.id)
+    return True
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -58,8 +333,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
 
+    session_id = payload.get("sid")
+    if session_id is not None and session_id in revoked_sessions:
+        raise credentials_exception
+
+    if principal_cache.claims_are_fresh(username, payload.get("iat")):
+        principal = Principal.from_claims(payload)
+        if principal is not None:
+            return principal
+
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
-    return user
-
+    principal = Principal.from_user(user)
+    principal_cache.set(principal)
+    return principal
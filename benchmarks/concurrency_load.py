@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+DEFAULT_ENDPOINTS = ["/api/schedules", "/api/dashboard/stats", "/api/students?page=1&page_size=20"]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_level(client: httpx.AsyncClient, token: str, endpoints, concurrency: int, requests_per_worker: int):
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies = []
+    errors = 0
+
+    async def worker(offset: int):
+        nonlocal errors
+        for i in range(requests_per_worker):
+            url = endpoints[(offset + i) % len(endpoints)]
+            started = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000
+    }
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=max(args.levels) * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        token = await login(client, args.username, args.password)
+        baseline = None
+        print(f"{'conc':>5} {'req':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'scale':>6}")
+        for level in args.levels:
+            result = await run_level(client, token, args.endpoints, level, args.requests)
+            baseline = baseline or result["rps"]
+            print(
+                f"{result['concurrency']:>5} {result['requests']:>6} {result['errors']:>4} "
+                f"{result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+                f"{result['rps'] / baseline:>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест: пропускная способность API при росте числа параллельных клиентов")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8888")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests", type=int, default=25, help="запросов на одного клиента")
+    parser.add_argument("--endpoints", nargs="+", default=DEFAULT_ENDPOINTS)
+    asyncio.run(main(parser.parse_args()))
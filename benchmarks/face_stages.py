@@ -0,0 +1,210 @@
+import argparse
+import io
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from face_recognition_service import EMBEDDING_SIZE, FaceRecognitionService, pairwise_distances  # noqa: E402
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (4032, 3024)]
+FACE_COUNTS = [1, 2, 4, 8]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def measure(fn: Callable, repeat: int) -> Tuple[object, dict]:
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+
+    # Allocation tracing slows the code down, so the peak comes from a separate run.
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "min_ms": round(min(timings) * 1000, 3),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def encode_image(image: Image.Image, fmt: str = "JPEG") -> bytes:
+    stream = io.BytesIO()
+    image.save(stream, fmt, quality=90)
+    return stream.getvalue()
+
+
+def synthetic_photo(width: int, height: int, rng: random.Random) -> bytes:
+    image = Image.new("RGB", (width, height), (rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randint(0, width), rng.randint(0, height)
+        r = rng.randint(10, max(11, width // 8))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)))
+    return encode_image(image)
+
+
+def group_photo(face: Image.Image, count: int, width: int, height: int) -> bytes:
+    columns = int(np.ceil(np.sqrt(count)))
+    rows = int(np.ceil(count / columns))
+    cell_w, cell_h = width // columns, height // rows
+    tile = face.copy()
+    tile.thumbnail((cell_w, cell_h))
+    canvas = Image.new("RGB", (width, height), (200, 200, 200))
+    for n in range(count):
+        canvas.paste(tile, ((n % columns) * cell_w, (n // columns) * cell_h))
+    return encode_image(canvas)
+
+
+def build_corpus(photo_dir: Optional[str], seed: int) -> List[Tuple[str, bytes]]:
+    rng = random.Random(seed)
+    corpus = [(f"synthetic {w}x{h}", synthetic_photo(w, h, rng)) for w, h in RESOLUTIONS]
+    if not photo_dir:
+        return corpus
+
+    photos = sorted(p for p in Path(photo_dir).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    for path in photos:
+        corpus.append((f"real {path.name}", path.read_bytes()))
+    if photos:
+        face = Image.open(photos[0]).convert("RGB")
+        for count in FACE_COUNTS[1:]:
+            for width, height in RESOLUTIONS[1:3]:
+                corpus.append((f"group x{count} {width}x{height}", group_photo(face, count, width, height)))
+    return corpus
+
+
+def stage_timings(service: FaceRecognitionService, image_bytes: bytes, repeat: int) -> Dict[str, object]:
+    def decode():
+        image = Image.open(io.BytesIO(image_bytes))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return np.array(image)
+
+    img_array, decode_stats = measure(decode, repeat)
+    faces, detect_stats = measure(lambda: service.detector(img_array, 1), repeat)
+    stages = {
+        "resolution": f"{img_array.shape[1]}x{img_array.shape[0]}",
+        "faces": len(faces),
+        "decode": decode_stats,
+        "detect": detect_stats,
+        "landmarks": None,
+        "encode": None
+    }
+
+    if faces and service.shape_predictor != "simple":
+        shapes, stages["landmarks"] = measure(
+            lambda: [service.shape_predictor(img_array, face) for face in faces], repeat
+        )
+        _, stages["encode"] = measure(
+            lambda: [service.face_encoder.compute_face_descriptor(img_array, shape) for shape in shapes], repeat
+        )
+    return stages
+
+
+def fake_roster(size: int, rng: np.random.Generator) -> List[SimpleNamespace]:
+    encodings = rng.normal(0, 0.1, size=(size, EMBEDDING_SIZE)).round(6)
+    return [SimpleNamespace(id=n + 1, face_encoding=json.dumps(row.tolist())) for n, row in enumerate(encodings)]
+
+
+def matching_timings(service: FaceRecognitionService, roster_sizes: List[int], face_counts: List[int],
+                     repeat: int, seed: int) -> List[dict]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in roster_sizes:
+        roster = fake_roster(size, rng)
+        parsed = np.array([json.loads(s.face_encoding) for s in roster])
+        for count in face_counts:
+            count = min(count, size)
+            faces = parsed[rng.choice(size, size=count, replace=False)] + rng.normal(0, 0.01, (count, EMBEDDING_SIZE))
+            _, parse_stats = measure(lambda: [json.loads(s.face_encoding) for s in roster], repeat)
+            _, distance_stats = measure(
+                lambda: pairwise_distances(faces, parsed).argmin(axis=1), repeat
+            )
+            matched, match_stats = measure(lambda: service.match_embeddings(faces, roster), repeat)
+            results.append({
+                "roster": size,
+                "faces": len(faces),
+                "matched": len(matched),
+                "parse_roster": parse_stats,
+                "distances": distance_stats,
+                "match_embeddings": match_stats
+            })
+    return results
+
+
+def end_to_end_timings(service: FaceRecognitionService, image_bytes: bytes, roster, repeat: int) -> dict:
+    _, single = measure(lambda: service.extract_face_encoding(image_bytes), repeat)
+    _, all_faces = measure(lambda: service.extract_all_faces(image_bytes), repeat)
+    _, recognize = measure(lambda: service.recognize_students(image_bytes, roster), repeat)
+    return {"extract_face_encoding": single, "extract_all_faces": all_faces, "recognize_students": recognize}
+
+
+def fmt(stats: Optional[dict]) -> str:
+    return f"{stats['median_ms']:>9.2f} ms {stats['peak_kib']:>9.0f} KiB" if stats else f"{'-':>25}"
+
+
+def main(args):
+    service = FaceRecognitionService(tolerance=0.6)
+    service._ensure_models()
+    corpus = build_corpus(args.photos, args.seed)
+    print(f"Модели: {service.model_version}, изображений: {len(corpus)}, повторов: {args.repeat}\n")
+
+    roster = fake_roster(args.e2e_roster, np.random.default_rng(args.seed))
+    images = []
+    print(f"{'image':<28} {'faces':>5} {'decode':>25} {'detect':>25} {'landmarks':>25} {'encode':>25}")
+    for name, image_bytes in corpus:
+        stages = stage_timings(service, image_bytes, args.repeat)
+        stages["end_to_end"] = end_to_end_timings(service, image_bytes, roster, args.repeat)
+        images.append({"name": name, "bytes": len(image_bytes), **stages})
+        print(f"{name:<28} {stages['faces']:>5} {fmt(stages['decode'])} {fmt(stages['detect'])} "
+              f"{fmt(stages['landmarks'])} {fmt(stages['encode'])}")
+
+    print(f"\n{'image':<28} {'extract_face_encoding':>25} {'extract_all_faces':>25} {'recognize_students':>25}")
+    for image in images:
+        e2e = image["end_to_end"]
+        print(f"{image['name']:<28} {fmt(e2e['extract_face_encoding'])} {fmt(e2e['extract_all_faces'])} "
+              f"{fmt(e2e['recognize_students'])}")
+
+    matching = matching_timings(service, args.roster_sizes, args.faces, args.repeat, args.seed)
+    print(f"\n{'roster':>8} {'faces':>5} {'parse roster':>25} {'distances':>25} {'match_embeddings':>25}")
+    for row in matching:
+        print(f"{row['roster']:>8} {row['faces']:>5} {fmt(row['parse_roster'])} {fmt(row['distances'])} "
+              f"{fmt(row['match_embeddings'])}")
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            "model_version": service.model_version,
+            "repeat": args.repeat,
+            "images": images,
+            "matching": matching
+        }, ensure_ascii=False, indent=2))
+        print(f"\nРезультаты сохранены в {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Микробенчмарки этапов FaceRecognitionService")
+    parser.add_argument("--photos", help="каталог с реальными фотографиями (по одному лицу на фото)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--roster-sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--faces", type=int, nargs="+", default=[1, 30], help="лиц на фото при замере сопоставления")
+    parser.add_argument("--e2e-roster", type=int, default=30, help="размер группы для recognize_students")
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    main(parser.parse_args())
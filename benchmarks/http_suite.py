@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "benchmarks" / ".data"
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "http.json"
+TEACHER_PASSWORD = "teacher123"
+
+
+class Scenario(NamedTuple):
+    name: str
+    concurrency: int
+    requests: int
+    send: Callable[[httpx.AsyncClient, dict, int], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(q * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_env(dataset: Path) -> dict:
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{dataset}", "REPORTING_DATABASE_URL": ""}
+
+
+def dataset_params(args) -> dict:
+    return {
+        "seed": args.seed, "groups": args.groups, "students_per_group": args.students_per_group,
+        "teachers": args.teachers, "semesters": args.semesters, "today": str(date.today())
+    }
+
+
+def ensure_dataset(args) -> Path:
+    dataset = Path(args.dataset).resolve()
+    params_file = dataset.with_suffix(".json")
+    params = dataset_params(args)
+    if dataset.exists() and params_file.exists() and not args.regenerate:
+        if json.loads(params_file.read_text()) == params:
+            return dataset
+
+    dataset.parent.mkdir(parents=True, exist_ok=True)
+    print(f"Генерация набора данных в {dataset}...")
+    subprocess.run([
+        sys.executable, "generate_dataset.py",
+        "--seed", str(args.seed),
+        "--groups", str(args.groups),
+        "--students-per-group", str(args.students_per_group),
+        "--teachers", str(args.teachers),
+        "--semesters", str(args.semesters),
+        # Fingerprint scenarios look up the lesson running now, so the dataset is anchored at the real date.
+        "--today", params["today"],
+    ], cwd=ROOT, env=dataset_env(dataset), check=True)
+    params_file.write_text(json.dumps(params))
+    return dataset
+
+
+@contextmanager
+def app_server(dataset: Path, workers: int):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=dataset_env(dataset)
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("Сервер завершился при запуске")
+            try:
+                if httpx.get(f"{base_url}/openapi.json", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Сервер не запустился за 120 секунд")
+            time.sleep(0.25)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> str:
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def prepare_context(client: httpx.AsyncClient, args) -> dict:
+    token = await login(client, args.username, args.password)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def get(url: str, **params):
+        response = await client.get(url, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    groups = await get("/api/groups")
+    students = (await get("/api/students", page_size=100, include_total="false"))["items"]
+    templates = (await get("/api/admin/schedule-templates", page_size=100, include_total="false"))["items"]
+    semester = next(s for s in await get("/api/semesters") if s["is_active"])
+
+    journal_targets = []
+    for group in groups[:3]:
+        lessons = [s for s in await get("/api/schedules", group_id=group["id"]) if s["can_edit"]]
+        for lesson in lessons[-5:]:
+            for record in (await get(f"/api/schedules/{lesson['id']}/records"))[:10]:
+                journal_targets.append((record["student_id"], lesson["id"]))
+
+    return {
+        "headers": headers,
+        "teachers": [f"teacher{n:04d}" for n in range(1, args.teachers + 1)],
+        "group_ids": [g["id"] for g in groups[:20]],
+        "student_ids": [s["id"] for s in students],
+        "classrooms": sorted({t["classroom"] for t in templates if t["classroom"]}),
+        "journal_targets": journal_targets,
+        "date_from": semester["start_date"],
+        "date_to": str(date.today())
+    }
+
+
+def pick(values: list, i: int):
+    return values[i % len(values)]
+
+
+async def send_login(client, ctx, i):
+    return await client.post("/token", data={"username": pick(ctx["teachers"], i), "password": TEACHER_PASSWORD})
+
+
+async def send_identify(client, ctx, i):
+    return await client.post("/api/fingerprint/identify", json={
+        "classroom": pick(ctx["classrooms"], i), "student_id": pick(ctx["student_ids"], i * 7)
+    })
+
+
+async def send_fingerprint_templates(client, ctx, i):
+    return await client.get("/api/fingerprint/students/templates", params={"classroom": pick(ctx["classrooms"], i)})
+
+
+async def send_journal_save(client, ctx, i):
+    student_id, schedule_id = pick(ctx["journal_targets"], i)
+    data = {"student_id": student_id, "schedule_id": schedule_id, "status": "present", "grade": 2 + i % 4}
+    return await client.post("/api/records", data=data, headers=ctx["headers"])
+
+
+async def send_report_export(client, ctx, i):
+    return await client.get("/api/reports/journal", headers=ctx["headers"], params={
+        "group_id": pick(ctx["group_ids"], i), "date_from": ctx["date_from"], "date_to": ctx["date_to"],
+        "format": "csv" if i % 2 else "xlsx"
+    })
+
+
+async def send_dashboard(client, ctx, i):
+    return await client.get("/api/dashboard/stats", headers=ctx["headers"])
+
+
+SCENARIOS = [
+    Scenario("login_storm", 32, 200, send_login),
+    Scenario("fingerprint_identify", 16, 800, send_identify),
+    Scenario("fingerprint_templates", 16, 400, send_fingerprint_templates),
+    Scenario("journal_save", 8, 400, send_journal_save),
+    Scenario("report_export", 4, 60, send_report_export),
+    Scenario("dashboard_poll", 16, 400, send_dashboard),
+]
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: dict, scenario: Scenario, scale: float, warmup: int) -> dict:
+    for i in range(warmup):
+        try:
+            await scenario.send(client, ctx, i)
+        except httpx.HTTPError:
+            pass
+
+    total = max(1, int(scenario.requests * scale))
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                response = await scenario.send(client, ctx, i)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(scenario.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": scenario.concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+async def run_suite(base_url: str, args) -> Dict[str, dict]:
+    selected = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    limits = httpx.Limits(max_connections=max(s.concurrency for s in selected) * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        ctx = await prepare_context(client, args)
+        results = {}
+        print(f"{'scenario':<24} {'conc':>5} {'req':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for scenario in selected:
+            result = await run_scenario(client, ctx, scenario, args.scale, args.warmup)
+            results[scenario.name] = result
+            print(
+                f"{scenario.name:<24} {result['concurrency']:>5} {result['requests']:>6} {result['errors']:>4} "
+                f"{result['rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+            )
+        return results
+
+
+def main(args):
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "workers": args.workers,
+        "scale": args.scale,
+        "dataset": None if args.base_url else dataset_params(args)
+    }
+
+    if args.base_url:
+        scenarios = asyncio.run(run_suite(args.base_url, args))
+    else:
+        dataset = ensure_dataset(args)
+        with app_server(dataset, args.workers) as base_url:
+            scenarios = asyncio.run(run_suite(base_url, args))
+
+    results = {"meta": meta, "scenarios": scenarios}
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\nРезультаты сохранены в {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+        print(f"Базовая линия обновлена: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        # Baselines are per machine and are not committed, so a missing one must not look like a passing run.
+        print(f"Базовая линия {baseline_path} не найдена: снимите её на этой машине с --save-baseline")
+        return 2
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    if regressions:
+        print(f"\nРегрессии (порог {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("Регрессий относительно базовой линии нет")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Набор HTTP-бенчмарков горячих эндпоинтов с порогами регрессии")
+    parser.add_argument("--base-url", help="использовать уже запущенный сервер вместо локального")
+    parser.add_argument("--dataset", default=str(DATA_DIR / "bench.db"))
+    parser.add_argument("--regenerate", action="store_true", help="пересоздать набор данных")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--students-per-group", type=int, default=25)
+    parser.add_argument("--teachers", type=int, default=150)
+    parser.add_argument("--semesters", type=int, default=2)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель числа запросов в сценариях")
+    parser.add_argument("--warmup", type=int, default=10, help="разогревочных запросов на сценарий")
+    parser.add_argument("--only", nargs="+", choices=[s.name for s in SCENARIOS])
+    parser.add_argument("--output", default=str(RESULTS_DIR / "latest.json"))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое ухудшение p95 и rps")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,209 @@
+import argparse
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "startup.json"
+HEAVY_MODULES = ["numpy", "PIL", "dlib", "cv2", "openpyxl", "face_recognition_service"]
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def database_env(database: Path) -> dict:
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "REPORTING_DATABASE_URL": ""}
+
+
+def prepare_database(database: Path):
+    subprocess.run([sys.executable, "migrations.py"], cwd=ROOT, env=database_env(database), check=True,
+                   stdout=subprocess.DEVNULL)
+
+
+def import_timings(env: dict, runs: int) -> dict:
+    timings = []
+    heavy: List[str] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        heavy = probe["heavy"]
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "min_ms": round(min(timings) * 1000, 1),
+        "heavy_modules": heavy
+    }
+
+
+def import_breakdown(env: dict, top: int) -> List[dict]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env, capture_output=True, text=True,
+        check=True
+    ).stderr
+
+    modules: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Direct imports of main are indented one level and carry the cost of everything below them.
+        if len(name) - len(name.lstrip()) == 3:
+            modules[name.strip()] = int(cumulative)
+    ranked = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def wait_for(url: str, process: subprocess.Popen, deadline: float) -> Optional[float]:
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Сервер завершился при запуске")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return time.monotonic()
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    return None
+
+
+def server_timings(env: dict, timeout: float) -> dict:
+    port = free_port()
+    started = time.monotonic()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        serving = wait_for(f"{base_url}/openapi.json", process, started + timeout)
+        if serving is None:
+            raise RuntimeError(f"Сервер не начал отвечать за {timeout:.0f} секунд")
+        ready = wait_for(f"{base_url}/health/ready", process, started + timeout)
+        return {
+            "first_response_ms": round((serving - started) * 1000, 1),
+            "ready_ms": round((ready - started) * 1000, 1) if ready else None
+        }
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    regressions = []
+    for key in ("import", "server"):
+        for metric, previous in baseline.get(key, {}).items():
+            current = results[key].get(metric)
+            if isinstance(previous, (int, float)) and current is not None and previous:
+                if current > previous * (1 + threshold):
+                    regressions.append(f"{key}.{metric}: {previous} -> {current} ms")
+    new_heavy = set(results["import"]["heavy_modules"]) - set(baseline.get("import", {}).get("heavy_modules", []))
+    if new_heavy:
+        regressions.append(f"import main теперь загружает: {', '.join(sorted(new_heavy))}")
+    return regressions
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = database_env(Path(tmp) / "startup.db")
+        prepare_database(Path(tmp) / "startup.db")
+        imports = import_timings(env, args.runs)
+        breakdown = import_breakdown(env, args.top)
+        server = server_timings(env, args.timeout)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs
+        },
+        "import": imports,
+        "server": server,
+        "breakdown": breakdown
+    }
+
+    print(f"import main: {imports['median_ms']} ms (min {imports['min_ms']} ms)")
+    print(f"тяжелые модули при импорте: {', '.join(imports['heavy_modules']) or 'нет'}")
+    print(f"первый ответ сервера: {server['first_response_ms']} ms, готовность: {server['ready_ms']} ms")
+    print(f"\n{'module':<32} {'cumulative':>12}")
+    for row in breakdown:
+        print(f"{row['module']:<32} {row['cumulative_ms']:>9.1f} ms")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"\nРезультаты сохранены в {output}")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, ensure_ascii=False, indent=2))
+        print(f"Базовая линия обновлена: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        # Baselines are per machine and are not committed, so a missing one must not look like a passing run.
+        print(f"Базовая линия {baseline_path} не найдена: снимите её на этой машине с --save-baseline")
+        return 2
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.threshold)
+    if regressions:
+        print(f"\nРегрессии (порог {args.threshold:.0%}):")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("Регрессий относительно базовой линии нет")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Время импорта и запуска приложения с порогами регрессии")
+    parser.add_argument("--runs", type=int, default=7, help="запусков import main в отдельных процессах")
+    parser.add_argument("--top", type=int, default=15, help="сколько самых дорогих модулей показать")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", default=str(RESULTS_DIR / "startup.json"))
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое ухудшение времени запуска")
+    sys.exit(main(parser.parse_args()))
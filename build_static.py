@@ -0,0 +1,79 @@
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import brotli
+import rcssmin
+import rjsmin
+
+from static_assets import DIST_DIR_NAME, MANIFEST_NAME, STATIC_DIR
+
+MINIFIERS = {
+    ".js": lambda source: rjsmin.jsmin(source),
+    ".css": lambda source: rcssmin.cssmin(source),
+}
+COMPRESSIBLE = {".js", ".css", ".svg", ".json", ".txt", ".html", ".map"}
+HASH_LENGTH = 10
+
+
+def hashed_name(path: Path, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def write_compressed(target: Path, content: bytes) -> dict:
+    sizes = {}
+    # mtime=0 keeps the .gz output byte-identical between builds of the same input.
+    for encoding, suffix, compressed in (
+        ("gzip", ".gz", gzip.compress(content, compresslevel=9, mtime=0)),
+        ("br", ".br", brotli.compress(content, quality=11)),
+    ):
+        if len(compressed) < len(content):
+            target.with_name(target.name + suffix).write_bytes(compressed)
+            sizes[encoding] = len(compressed)
+    return sizes
+
+
+def build(static_dir: Path, minify: bool) -> dict:
+    dist_dir = static_dir / DIST_DIR_NAME
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    dist_dir.mkdir()
+
+    manifest = {}
+    report = []
+    for source in sorted(p for p in static_dir.rglob("*") if p.is_file() and dist_dir not in p.parents):
+        relative = source.relative_to(static_dir)
+        content = source.read_bytes()
+        minifier = MINIFIERS.get(source.suffix) if minify else None
+        if minifier is not None:
+            content = minifier(content.decode("utf-8")).encode("utf-8")
+
+        name = hashed_name(relative, content)
+        target = dist_dir / relative.parent / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        manifest[relative.as_posix()] = (relative.parent / name).as_posix()
+
+        sizes = write_compressed(target, content) if source.suffix in COMPRESSIBLE else {}
+        report.append((relative.as_posix(), source.stat().st_size, len(content), sizes.get("gzip"), sizes.get("br")))
+
+    (dist_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    return {"manifest": manifest, "report": report}
+
+
+def main(args):
+    result = build(Path(args.static_dir), not args.no_minify)
+    print(f"{'file':<24} {'source':>9} {'minified':>9} {'gzip':>9} {'brotli':>9}")
+    for name, source_size, size, gzip_size, br_size in result["report"]:
+        print(f"{name:<24} {source_size:>9} {size:>9} {gzip_size or '-':>9} {br_size or '-':>9}")
+    print(f"\nСобрано файлов: {len(result['manifest'])} в {Path(args.static_dir) / DIST_DIR_NAME}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сборка статики: минификация, хэши в именах, gzip/brotli")
+    parser.add_argument("--static-dir", default=str(STATIC_DIR))
+    parser.add_argument("--no-minify", action="store_true", help="только хэши и сжатие, без минификации")
+    main(parser.parse_args())
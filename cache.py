@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from fast_json import dumps_json
+from invalidation import invalidation_bus
+from metrics import record_cache_lookup
+
+RESPONSE_CACHE_MAX_ENTRIES = 1024
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[tuple, Tuple[bytes, str, Tuple[str, ...]]]" = OrderedDict()
+        self._tags: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def make_key(self, request: Request, role) -> tuple:
+        params = tuple(sorted(request.query_params.multi_items()))
+        return request.url.path, params, getattr(role, "value", role)
+
+    def get(self, key: tuple) -> Optional[Tuple[bytes, str, Tuple[str, ...]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                record_cache_lookup("response", False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup("response", True)
+            return entry
+
+    def set(self, key: tuple, body: bytes, etag: str, tags: Iterable[str], generation: int):
+        tags = tuple(tags)
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (body, etag, tags)
+            self._entries.move_to_end(key)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                old_key, (_, _, old_tags) = self._entries.popitem(last=False)
+                self._forget(old_key, old_tags)
+
+    def invalidate(self, *tags: str):
+        self.invalidate_local(*tags)
+        invalidation_bus.publish("response_cache", ",".join(tags))
+
+    def invalidate_local(self, *tags: str):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            for tag in tags:
+                for key in self._tags.pop(tag, set()):
+                    entry = self._entries.pop(key, None)
+                    if entry is not None:
+                        self._forget(key, entry[2])
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def _forget(self, key: tuple, tags: Tuple[str, ...]):
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0
+            }
+
+
+response_cache = ResponseCache()
+invalidation_bus.subscribe("response_cache", lambda tags: response_cache.invalidate_local(*tags.split(",")))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_json_response(request: Request, role, tags: Iterable[str], producer: Callable[[], object]) -> Response:
+    key = response_cache.make_key(request, role)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        body = dumps_json(jsonable_encoder(producer()))
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        response_cache.set(key, body, etag, tags, generation)
+    else:
+        body, etag, _ = entry
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,68 @@
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    database_url: str = "sqlite:///./university.db"
+
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+    sqlite_cache_size_kib: int = 65536
+
+    reporting_database_url: Optional[str] = None
+    reporting_pool_size: int = 4
+    reporting_max_overflow: int = 4
+    reporting_statement_timeout_ms: int = 30000
+
+    secret_key: str = "your-secret-key-here-change-in-production"
+    access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 7
+    refresh_token_max_lifetime_days: int = 30
+
+    principal_cache_ttl_seconds: int = 60
+
+    invalidation_poll_seconds: float = 1.0
+    invalidation_retention_seconds: int = 3600
+
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    login_failure_window_seconds: int = 300
+    login_max_failures_per_user: int = 5
+    login_max_failures_per_ip: int = 30
+    login_failure_max_keys: int = 10000
+
+    import_batch_size: int = 1000
+
+    compression_min_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    tracing_enabled: bool = False
+    slow_request_ms: Optional[float] = None
+    tracing_max_statements: int = 20
+    tracing_n_plus_one_threshold: int = 10
+
+    face_shape_predictor_path: str = "shape_predictor_68_face_landmarks.dat"
+    face_encoder_model_path: str = "dlib_face_recognition_resnet_model_v1.dat"
+    face_allow_simple_mode: bool = False
+    face_warmup_on_startup: bool = True
+
+    face_workers: int = 2
+    face_enroll_batch_size: int = 64
+    face_enroll_max_image_bytes: int = 10 * 1024 * 1024
+    face_embedding_cache_bytes: int = 16 * 1024 * 1024
+    face_embedding_cache_ttl_seconds: int = 3600
+
+
+settings = Settings()
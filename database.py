@@ -1,14 +1,125 @@
-from sqlalchemy import create_engine
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def build_engine(url: str, **engine_kwargs):
+    if is_sqlite_url(url):
+        connect_args = {"check_same_thread": False, **engine_kwargs.pop("connect_args", {})}
+        if make_url(url).database in (None, "", ":memory:"):
+            engine_kwargs.setdefault("poolclass", StaticPool)
+        sqlite_engine = create_engine(url, connect_args=connect_args, **engine_kwargs)
+        event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
+        return sqlite_engine
+
+    engine_kwargs.setdefault("pool_size", settings.db_pool_size)
+    engine_kwargs.setdefault("max_overflow", settings.db_max_overflow)
+    engine_kwargs.setdefault("pool_timeout", settings.db_pool_timeout)
+    engine_kwargs.setdefault("pool_recycle", settings.db_pool_recycle)
+    engine_kwargs.setdefault("pool_pre_ping", settings.db_pool_pre_ping)
+    return create_engine(url, **engine_kwargs)
+
+
+def install_sqlite_reporting_guards(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+    def check_deadline():
+        deadline = connection_record.info.get("deadline")
+        return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+    dbapi_connection.set_progress_handler(check_deadline, 10000)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./university.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def start_statement_deadline(conn, cursor, statement, parameters, context, executemany):
+    conn.info["deadline"] = time.monotonic() + settings.reporting_statement_timeout_ms / 1000
+
+
+# The deadline must not outlive the statement: the progress handler also fires during commit, rollback
+# and the reset on pool return, and interrupting those invalidates the pooled connection.
+# It is not cleared in after_cursor_execute because SQLite keeps stepping the query while rows are fetched.
+def end_statement_deadline(conn):
+    conn.info.pop("deadline", None)
+
+
+def end_statement_deadline_on_error(context):
+    if context.connection is not None:
+        context.connection.info.pop("deadline", None)
+
+
+def end_statement_deadline_on_reset(dbapi_connection, connection_record, reset_state):
+    connection_record.info.pop("deadline", None)
+
+
+def build_reporting_engine():
+    url = settings.reporting_database_url or SQLALCHEMY_DATABASE_URL
+    if is_sqlite_url(url):
+        if make_url(url).database in (None, "", ":memory:"):
+            return engine
+        reporting = build_engine(
+            url,
+            pool_size=settings.reporting_pool_size,
+            max_overflow=settings.reporting_max_overflow
+        )
+        event.listen(reporting, "connect", install_sqlite_reporting_guards)
+        event.listen(reporting, "before_cursor_execute", start_statement_deadline)
+        event.listen(reporting, "commit", end_statement_deadline)
+        event.listen(reporting, "rollback", end_statement_deadline)
+        event.listen(reporting, "handle_error", end_statement_deadline_on_error)
+        event.listen(reporting.pool, "reset", end_statement_deadline_on_reset)
+        return reporting
+
+    return build_engine(
+        url,
+        pool_size=settings.reporting_pool_size,
+        max_overflow=settings.reporting_max_overflow,
+        connect_args={
+            "options": f"-c statement_timeout={settings.reporting_statement_timeout_ms} "
+                       f"-c default_transaction_read_only=on"
+        }
+    )
+
+
+def is_statement_timeout(exc: OperationalError) -> bool:
+    message = str(exc.orig).lower()
+    return "interrupted" in message or "statement timeout" in message
+
+
+engine = build_engine(SQLALCHEMY_DATABASE_URL)
+reporting_engine = build_reporting_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReportingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=reporting_engine)
 
 Base = declarative_base()
 
@@ -20,3 +131,14 @@ def get_db():
     finally:
         db.close()
 
+
+def get_report_db():
+    db = ReportingSessionLocal()
+    try:
+        yield db
+    except OperationalError as e:
+        if is_statement_timeout(e):
+            raise HTTPException(status_code=503, detail="Report query exceeded the time limit")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,164 @@
+import json
+import posixpath
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from config import settings
+from face_recognition_service import FaceWorkerPool
+from models import Student
+from search import normalize_name
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+student_face_update = update(Student.__table__).where(
+    Student.__table__.c.id == bindparam("student_id")
+).values(face_encoding=bindparam("encoding"))
+
+
+class StudentLookup:
+
+    def __init__(self, db: Session, group_id: Optional[int] = None):
+        query = db.query(Student.id, Student.search_name)
+        if group_id is not None:
+            query = query.filter(Student.group_id == group_id)
+
+        self.ids = set()
+        self.by_name: Dict[str, Optional[int]] = {}
+        for student_id, search_name in query:
+            self.ids.add(student_id)
+            # Two students with the same name can't be told apart by filename.
+            self.by_name[search_name] = None if search_name in self.by_name else student_id
+
+    def resolve(self, filename: str) -> int:
+        stem = posixpath.splitext(posixpath.basename(filename))[0].strip()
+        if stem.isdigit():
+            if int(stem) not in self.ids:
+                raise ValueError(f"Unknown student id: {stem}")
+            return int(stem)
+
+        key = normalize_name(stem.replace("_", " "))
+        if key not in self.by_name:
+            raise ValueError(f"Unknown student: {stem}")
+        if self.by_name[key] is None:
+            raise ValueError(f"Several students are named {stem}, use the student id instead")
+        return self.by_name[key]
+
+
+class EnrollmentReport:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.enrolled = 0
+        self.failed = 0
+        self.files: List[dict] = []
+
+    def success(self, filename: str, student_id: int):
+        self.enrolled += 1
+        self.files.append({"file": filename, "student_id": student_id, "status": "enrolled"})
+
+    def error(self, filename: str, message: str, student_id: Optional[int] = None):
+        self.failed += 1
+        self.files.append({"file": filename, "student_id": student_id, "status": "error", "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        processed = self.enrolled + self.failed
+        return {
+            "processed": processed,
+            "enrolled": self.enrolled,
+            "failed": self.failed,
+            "files": self.files,
+            "elapsed_seconds": round(elapsed, 3),
+            "files_per_second": round(processed / elapsed, 1) if elapsed else None
+        }
+
+
+def encode_batch(pool: FaceWorkerPool, batch: List[Tuple[str, int, bytes]], report: EnrollmentReport) -> List[dict]:
+    futures = []
+    for filename, student_id, image_bytes in batch:
+        try:
+            futures.append((filename, student_id, pool.submit(image_bytes)))
+        except BrokenProcessPool:
+            report.error(filename, "Face worker pool is unavailable", student_id)
+
+    updates = []
+    for filename, student_id, future in futures:
+        try:
+            encodings = future.result()
+        except BrokenProcessPool:
+            report.error(filename, "Face worker crashed", student_id)
+            continue
+        except Exception:
+            report.error(filename, "Could not read image", student_id)
+            continue
+        if not encodings:
+            report.error(filename, "No face found", student_id)
+        elif len(encodings) > 1:
+            report.error(filename, f"Expected one face, found {len(encodings)}", student_id)
+        else:
+            updates.append({"student_id": student_id, "encoding": json.dumps(encodings[0]), "file": filename})
+    return updates
+
+
+def commit_batch(db: Session, updates: List[dict], report: EnrollmentReport):
+    if not updates:
+        return
+    try:
+        db.execute(student_face_update, [
+            {"student_id": u["student_id"], "encoding": u["encoding"]} for u in updates
+        ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for u in updates:
+            report.error(u["file"], f"Could not save encoding: {e.__class__.__name__}", u["student_id"])
+        return
+    for u in updates:
+        report.success(u["file"], u["student_id"])
+
+
+def enroll_faces_from_zip(stream: BinaryIO, db: Session, pool: FaceWorkerPool,
+                          group_id: Optional[int] = None) -> dict:
+    report = EnrollmentReport()
+    lookup = StudentLookup(db, group_id)
+    batch_size = settings.face_enroll_batch_size
+    seen_students = set()
+    batch: List[Tuple[str, int, bytes]] = []
+
+    with zipfile.ZipFile(stream) as archive:
+        for info in archive.infolist():
+            filename = info.filename
+            basename = posixpath.basename(filename)
+            if info.is_dir() or basename.startswith(".") or filename.startswith("__MACOSX/"):
+                continue
+            if not basename.lower().endswith(IMAGE_EXTENSIONS):
+                report.error(filename, "Unsupported file type")
+                continue
+            if info.file_size > settings.face_enroll_max_image_bytes:
+                report.error(filename, "Image is too large")
+                continue
+
+            try:
+                student_id = lookup.resolve(filename)
+            except ValueError as e:
+                report.error(filename, str(e))
+                continue
+            if student_id in seen_students:
+                report.error(filename, "Another photo in the archive is already mapped to this student", student_id)
+                continue
+            seen_students.add(student_id)
+
+            batch.append((filename, student_id, archive.read(info)))
+            if len(batch) >= batch_size:
+                commit_batch(db, encode_batch(pool, batch, report), report)
+                batch = []
+
+        if batch:
+            commit_batch(db, encode_batch(pool, batch, report), report)
+
+    return report.as_dict()
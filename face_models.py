@@ -0,0 +1,31 @@
+import logging
+
+from config import settings
+
+MODEL_DOWNLOAD_URLS = (
+    "http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2",
+    "http://dlib.net/files/dlib_face_recognition_resnet_model_v1.dat.bz2",
+)
+
+logger = logging.getLogger("journal.faces")
+
+
+class FaceModelsUnavailable(RuntimeError):
+    pass
+
+
+def load_dlib_models():
+    import dlib
+
+    try:
+        shape_predictor = dlib.shape_predictor(settings.face_shape_predictor_path)
+        face_encoder = dlib.face_recognition_model_v1(settings.face_encoder_model_path)
+    except RuntimeError as e:
+        if not settings.face_allow_simple_mode:
+            raise FaceModelsUnavailable(
+                f"Модели dlib не загружены ({e}). Скачайте их: {', '.join(MODEL_DOWNLOAD_URLS)}"
+            ) from e
+        logger.warning("Модели dlib не найдены, FACE_ALLOW_SIMPLE_MODE включен: "
+                       "распознавание работает в упрощенном режиме (%s)", e)
+        return "simple", "simple"
+    return shape_predictor, face_encoder
@@ -1,34 +1,160 @@
 import dlib
 import numpy as np
 from PIL import Image
+import hashlib
 import io
 import json
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Tuple, Optional
 from sqlalchemy.orm import Session
+from config import settings
+from face_models import FaceModelsUnavailable, load_dlib_models
+from metrics import FACE_QUEUE_DEPTH, FACE_RECOGNITION_FACES, FACE_STAGE_DURATION, record_cache_lookup
 from models import Student
-import cv2
+
+EMBEDDING_SIZE = 128
+ENTRY_OVERHEAD_BYTES = 256
+
+logger = logging.getLogger("journal.faces")
+
+
+def pairwise_distances(faces: np.ndarray, roster: np.ndarray) -> np.ndarray:
+    squared = (faces ** 2).sum(axis=1)[:, None] + (roster ** 2).sum(axis=1)[None, :] - 2 * faces @ roster.T
+    return np.sqrt(np.maximum(squared, 0))
+
+
+class EmbeddingCache:
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_bytes: bytes, model_version: str) -> str:
+        return f"{model_version}:{hashlib.sha256(image_bytes).hexdigest()}"
+
+    @staticmethod
+    def entry_size(embeddings: np.ndarray) -> int:
+        return embeddings.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                record_cache_lookup("face_embeddings", False)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup("face_embeddings", True)
+            return entry[1]
+
+    def set(self, key: str, embeddings: np.ndarray):
+        size = self.entry_size(embeddings)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (time.monotonic(), embeddings)
+            self.size_bytes += size
+            self._evict()
+
+    def _pop(self, key: str):
+        _, embeddings = self._entries.pop(key)
+        self.size_bytes -= self.entry_size(embeddings)
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (stored_at, _) = next(iter(self._entries.items()))
+            if self.size_bytes <= self.max_bytes and now - stored_at <= self.ttl_seconds:
+                break
+            self._pop(key)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
 
 
 class FaceRecognitionService:
 
-    def __init__(self, tolerance: float = 0.6):
+    def __init__(self, tolerance: float = 0.6, embedding_cache: Optional[EmbeddingCache] = None):
         self.tolerance = tolerance
+        self.embedding_cache = embedding_cache
         self.detector = dlib.get_frontal_face_detector()
         self.shape_predictor = None
         self.face_encoder = None
+        self.load_error: Optional[str] = None
+        self._models_lock = threading.Lock()
 
     def _ensure_models(self):
-        if self.shape_predictor is None:
+        if self.face_encoder is not None:
+            return
+        with self._models_lock:
+            if self.face_encoder is not None:
+                return
             try:
-                self.shape_predictor = dlib.shape_predictor('shape_predictor_68_face_landmarks.dat')
-                self.face_encoder = dlib.face_recognition_model_v1('dlib_face_recognition_resnet_model_v1.dat')
-            except:
-                print("⚠️ Модели dlib не найдены. Система будет работать в упрощенном режиме.")
-                print("Для полной функциональности скачайте модели:")
-                print("http://dlib.net/files/shape_predictor_68_face_landmarks.dat.bz2")
-                print("http://dlib.net/files/dlib_face_recognition_resnet_model_v1.dat.bz2")
-                self.shape_predictor = "simple"
-                self.face_encoder = "simple"
+                shape_predictor, face_encoder = load_dlib_models()
+            except FaceModelsUnavailable as e:
+                self.load_error = str(e)
+                raise
+            self.load_error = None
+            self.shape_predictor = shape_predictor
+            self.face_encoder = face_encoder
+
+    def require_models(self):
+        self._ensure_models()
+
+    def warm_up(self):
+        started = time.perf_counter()
+        try:
+            self._ensure_models()
+        except FaceModelsUnavailable as e:
+            logger.error("%s", e)
+            return
+        # The first detector call allocates its image pyramid buffers.
+        self.detector(np.zeros((64, 64, 3), dtype=np.uint8), 0)
+        logger.info("Модели распознавания лиц загружены за %.1f с (%s)",
+                    time.perf_counter() - started, self.model_version)
+
+    def models_status(self) -> Dict[str, Optional[str]]:
+        if self.face_encoder is None:
+            state = "failed" if self.load_error else "loading"
+        else:
+            state = "degraded" if self.face_encoder == "simple" else "ready"
+        return {
+            "state": state,
+            "model_version": self.model_version if self.face_encoder is not None else None,
+            "error": self.load_error
+        }
 
     def extract_face_encoding(self, image_bytes: bytes) -> Optional[List[float]]:
         try:
@@ -61,99 +187,132 @@ class FaceRecognitionService:
 
             return encoding
 
+        except FaceModelsUnavailable:
+            raise
         except Exception as e:
             print(f"Ошибка при извлечении лица: {e}")
             import traceback
             traceback.print_exc()
             return None
 
-    def extract_all_faces(self, image_bytes: bytes) -> List[List[float]]:
-        try:
-            self._ensure_models()
+    def encode_all_faces(self, image_bytes: bytes) -> List[List[float]]:
+        self._ensure_models()
 
+        with FACE_STAGE_DURATION.labels(stage="decode").time():
             image = Image.open(io.BytesIO(image_bytes))
             if image.mode != 'RGB':
                 image = image.convert('RGB')
 
             img_array = np.array(image)
 
+        with FACE_STAGE_DURATION.labels(stage="detect").time():
             faces = self.detector(img_array, 1)
 
-            encodings = []
-            for face in faces:
-                if self.shape_predictor == "simple":
-                    encoding = [
-                        float(face.left()), float(face.top()),
-                        float(face.right()), float(face.bottom()),
-                        float(face.width()), float(face.height())
-                    ]
-                    encoding.extend([0.0] * 122)
-                else:
+        encodings = []
+        for face in faces:
+            if self.shape_predictor == "simple":
+                encoding = [
+                    float(face.left()), float(face.top()),
+                    float(face.right()), float(face.bottom()),
+                    float(face.width()), float(face.height())
+                ]
+                encoding.extend([0.0] * 122)
+            else:
+                with FACE_STAGE_DURATION.labels(stage="landmarks").time():
                     shape = self.shape_predictor(img_array, face)
+                with FACE_STAGE_DURATION.labels(stage="encode").time():
                     face_descriptor = self.face_encoder.compute_face_descriptor(img_array, shape)
-                    encoding = list(face_descriptor)
-                encodings.append(encoding)
+                encoding = list(face_descriptor)
+            encodings.append(encoding)
 
-            return encodings
+        return encodings
+
+    def extract_all_faces(self, image_bytes: bytes) -> List[List[float]]:
+        try:
+            return self.encode_all_faces(image_bytes)
+        except FaceModelsUnavailable:
+            raise
         except Exception as e:
             print(f"Ошибка при извлечении лиц: {e}")
             import traceback
             traceback.print_exc()
             return []
 
-    def save_student_face(self, student_id: int, image_bytes: bytes, db: Session) -> bool:
-        encoding = self.extract_face_encoding(image_bytes)
-        if encoding is None:
-            return False
-
-        student = db.query(Student).filter(Student.id == student_id).first()
-        if not student:
-            return False
-
-        student.face_encoding = json.dumps(encoding)
-        db.commit()
-        return True
-
-    def recognize_students(
-        self,
-        image_bytes: bytes,
-        students: List[Student]
-    ) -> Tuple[List[int], int]:
+    @property
+    def model_version(self) -> str:
         self._ensure_models()
+        return "simple" if self.shape_predictor == "simple" else "dlib-resnet-v1"
 
-        photo_encodings = self.extract_all_faces(image_bytes)
+    def extract_embeddings(self, image_bytes: bytes) -> np.ndarray:
+        key = None
+        if self.embedding_cache is not None:
+            key = EmbeddingCache.make_key(image_bytes, self.model_version)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                return cached
 
-        if not photo_encodings:
-            return [], 0
+        try:
+            embeddings = np.array(self.encode_all_faces(image_bytes), dtype=np.float64).reshape(-1, EMBEDDING_SIZE)
+        except FaceModelsUnavailable:
+            raise
+        except Exception as e:
+            print(f"Ошибка при извлечении лиц: {e}")
+            return np.empty((0, EMBEDDING_SIZE))
 
-        recognized_ids = []
+        embeddings.setflags(write=False)
+        if key is not None:
+            self.embedding_cache.set(key, embeddings)
+        return embeddings
 
-        student_encodings = {}
+    def match_embeddings(self, embeddings: np.ndarray, students: List[Student]) -> List[int]:
+        student_ids = []
+        student_encodings = []
         for student in students:
             if student.face_encoding:
                 try:
-                    encoding = np.array(json.loads(student.face_encoding))
-                    student_encodings[student.id] = encoding
+                    student_encodings.append(json.loads(student.face_encoding))
+                    student_ids.append(student.id)
                 except:
                     continue
 
-        for photo_encoding in photo_encodings:
-            photo_enc_array = np.array(photo_encoding)
+        if not student_ids or len(embeddings) == 0:
+            return []
 
-            best_match_id = None
-            best_distance = float('inf')
+        with FACE_STAGE_DURATION.labels(stage="match").time():
+            roster = np.array(student_encodings, dtype=np.float64)
+            distances = pairwise_distances(embeddings, roster)
+            best = distances.argmin(axis=1)
 
-            for student_id, student_encoding in student_encodings.items():
-                distance = np.linalg.norm(student_encoding - photo_enc_array)
+            recognized_ids = []
+            for face_index, student_index in enumerate(best):
+                student_id = student_ids[student_index]
+                if distances[face_index, student_index] <= self.tolerance and student_id not in recognized_ids:
+                    recognized_ids.append(student_id)
+        return recognized_ids
 
-                if distance < best_distance and distance <= self.tolerance:
-                    best_distance = distance
-                    best_match_id = student_id
+    def save_student_face(self, student: Student, image_bytes: bytes, db: Session) -> bool:
+        encoding = self.extract_face_encoding(image_bytes)
+        if encoding is None:
+            return False
 
-            if best_match_id is not None and best_match_id not in recognized_ids:
-                recognized_ids.append(best_match_id)
+        student.face_encoding = json.dumps(encoding)
+        db.commit()
+        return True
 
-        return recognized_ids, len(photo_encodings)
+    def recognize_students(
+        self,
+        image_bytes: bytes,
+        students: List[Student]
+    ) -> Tuple[List[int], int]:
+        embeddings = self.extract_embeddings(image_bytes)
+
+        if len(embeddings) == 0:
+            return [], 0
+
+        recognized_ids = self.match_embeddings(embeddings, students)
+        FACE_RECOGNITION_FACES.labels(outcome="matched").inc(len(recognized_ids))
+        FACE_RECOGNITION_FACES.labels(outcome="unmatched").inc(len(embeddings) - len(recognized_ids))
+        return recognized_ids, len(embeddings)
 
     def get_recognition_stats(
         self,
@@ -169,3 +328,73 @@ class FaceRecognitionService:
             "unrecognized_faces": max(0, total_faces - len(recognized_ids))
         }
 
+
+_worker_service: Optional[FaceRecognitionService] = None
+
+
+def _init_face_worker(tolerance: float):
+    global _worker_service
+    _worker_service = FaceRecognitionService(tolerance=tolerance)
+    _worker_service._ensure_models()
+
+
+def encode_faces_in_worker(image_bytes: bytes) -> List[List[float]]:
+    return _worker_service.encode_all_faces(image_bytes)
+
+
+class FaceWorkerPool:
+
+    def __init__(self, workers: int, tolerance: float = 0.6):
+        self.workers = workers
+        self.tolerance = tolerance
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_face_worker,
+                    initargs=(self.tolerance,)
+                )
+            return self._executor
+
+    def discard(self, executor: ProcessPoolExecutor):
+        # A worker that dies (OOM kill, crash in dlib) breaks the whole executor; the next submit starts a fresh one.
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        logger.warning("Пул процессов распознавания лиц сломан, будет создан заново")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, image_bytes: bytes):
+        executor = self.executor()
+        try:
+            future = executor.submit(encode_faces_in_worker, image_bytes)
+        except BrokenProcessPool:
+            self.discard(executor)
+            executor = self.executor()
+            future = executor.submit(encode_faces_in_worker, image_bytes)
+
+        FACE_QUEUE_DEPTH.inc()
+
+        def on_done(done):
+            FACE_QUEUE_DEPTH.dec()
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self.discard(executor)
+
+        future.add_done_callback(on_done)
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+
+face_worker_pool = FaceWorkerPool(settings.face_workers)
+embedding_cache = EmbeddingCache(settings.face_embedding_cache_bytes, settings.face_embedding_cache_ttl_seconds)
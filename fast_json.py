@@ -0,0 +1,13 @@
+import orjson
+from starlette.responses import JSONResponse
+
+
+def dumps_json(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+# For large payloads: return it directly from the endpoint so FastAPI skips jsonable_encoder as well.
+class FastJSONResponse(JSONResponse):
+
+    def render(self, content) -> bytes:
+        return dumps_json(content)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
-from datetime import datetime, date, timedelta, time as dt_time
+from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List, Optional
 
+from cache import response_cache
 from database import get_db
-from models import Student, ScheduleInstance, ScheduleTemplate, StudentRecord, StudentStatus, WeekType
+from fast_json import FastJSONResponse
+from lesson_slots import format_time
+from metrics import FINGERPRINT_IDENTIFY
+from models import Student, ScheduleInstance, ScheduleTemplate, LessonSlot, StudentRecord, StudentStatus
 from schemas import (
     FingerprintEnrollRequest,
     FingerprintScanRequest,
@@ -15,72 +18,21 @@ from schemas import (
 
 router = APIRouter(prefix="/api/fingerprint", tags=["fingerprint"])
 
-
-def is_even_week(check_date: date) -> bool:
-    start_date = date(2024, 1, 1)
-    days_diff = (check_date - start_date).days
-    week_number = days_diff // 7
-    return week_number % 2 == 0
+# The scanner's classroom is unauthenticated input; only values that matched a lesson slot become metric labels.
+UNMATCHED_CLASSROOM_LABEL = "other"
 
 
 def get_current_or_next_lesson(classroom: str, current_datetime: datetime, db: Session):
-    today = current_datetime.date()
-    current_time = current_datetime.time()
-    day_of_week = today.weekday()
-
-    if day_of_week == 6:
-        return None
-
-    even_week = is_even_week(today)
-    week_type = WeekType.EVEN if even_week else WeekType.ODD
-
-    instance = db.query(ScheduleInstance).join(
-        ScheduleTemplate
+    return db.query(ScheduleInstance).join(
+        LessonSlot, LessonSlot.schedule_instance_id == ScheduleInstance.id
+    ).join(
+        ScheduleTemplate, ScheduleInstance.template_id == ScheduleTemplate.id
     ).filter(
-        ScheduleInstance.date == today,
-        ScheduleInstance.is_cancelled == False,
-        or_(
-            ScheduleInstance.classroom == classroom,
-            and_(
-                ScheduleInstance.classroom.is_(None),
-                ScheduleTemplate.classroom == classroom
-            )
-        )
-    ).order_by(ScheduleTemplate.time_start).first()
-
-    if instance:
-        template = instance.template
-        start_time = datetime.strptime(template.time_start, "%H:%M").time()
-        end_time = datetime.strptime(template.time_end, "%H:%M").time()
-
-        time_before = (datetime.combine(today, start_time) - timedelta(minutes=15)).time()
-
-        if time_before <= current_time <= end_time:
-            return instance
-
-    templates = db.query(ScheduleTemplate).filter(
-        ScheduleTemplate.classroom == classroom,
-        ScheduleTemplate.day_of_week == day_of_week,
-        or_(
-            ScheduleTemplate.week_type == WeekType.BOTH,
-            ScheduleTemplate.week_type == week_type
-        )
-    ).order_by(ScheduleTemplate.time_start).all()
-
-    for template in templates:
-        start_time = datetime.strptime(template.time_start, "%H:%M").time()
-        time_before = (datetime.combine(today, start_time) - timedelta(minutes=15)).time()
-
-        if current_time <= time_before:
-            existing_instance = db.query(ScheduleInstance).filter(
-                ScheduleInstance.template_id == template.id,
-                ScheduleInstance.date == today
-            ).first()
-
-            if existing_instance and not existing_instance.is_cancelled:
-                return existing_instance
-
-    return None
+        LessonSlot.classroom == classroom,
+        LessonSlot.date == current_datetime.date(),
+        LessonSlot.ends_at >= current_datetime.time(),
+        ScheduleInstance.is_cancelled == False
+    ).order_by(LessonSlot.starts_at).first()
 
 
 @router.get("/students/templates", response_model=List[StudentWithFingerprintResponse])
@@ -101,17 +53,19 @@ def get_students_with_fingerprints(
             group_ids = [g.id for g in template.groups]
             query = query.filter(Student.group_id.in_(group_ids))
 
-    students = query.all()
+    students = query.with_entities(
+        Student.id, Student.full_name, Student.group_id, Student.fingerprint_template
+    ).all()
 
-    return [
-        StudentWithFingerprintResponse(
-            id=s.id,
-            full_name=s.full_name,
-            group_id=s.group_id,
-            fingerprint_template=s.fingerprint_template
-        )
+    return FastJSONResponse([
+        {
+            "id": s.id,
+            "full_name": s.full_name,
+            "group_id": s.group_id,
+            "fingerprint_template": s.fingerprint_template
+        }
         for s in students
-    ]
+    ])
 
 
 @router.post("/enroll")
@@ -130,6 +84,7 @@ def enroll_fingerprint(
 
     db.commit()
     db.refresh(student)
+    response_cache.invalidate("students")
 
     return {
         "success": True,
@@ -145,6 +100,7 @@ def identify_fingerprint(
 ):
     student = db.query(Student).filter(Student.id == request.student_id).first()
     if not student:
+        FINGERPRINT_IDENTIFY.labels(classroom=UNMATCHED_CLASSROOM_LABEL, result="unknown_student").inc()
         return FingerprintIdentifyResponse(
             success=False,
             message=f"Student with ID {request.student_id} not found"
@@ -154,6 +110,7 @@ def identify_fingerprint(
     lesson = get_current_or_next_lesson(request.classroom, current_datetime, db)
 
     if not lesson:
+        FINGERPRINT_IDENTIFY.labels(classroom=UNMATCHED_CLASSROOM_LABEL, result="no_lesson").inc()
         return FingerprintIdentifyResponse(
             success=False,
             student_id=student.id,
@@ -165,6 +122,7 @@ def identify_fingerprint(
     group_ids = [g.id for g in template.groups]
 
     if student.group_id not in group_ids:
+        FINGERPRINT_IDENTIFY.labels(classroom=request.classroom, result="wrong_group").inc()
         return FingerprintIdentifyResponse(
             success=False,
             student_id=student.id,
@@ -195,6 +153,7 @@ def identify_fingerprint(
         db.commit()
         message = f"Attendance marked for {student.full_name}"
 
+    FINGERPRINT_IDENTIFY.labels(classroom=request.classroom, result="identified").inc()
     return FingerprintIdentifyResponse(
         success=True,
         student_id=student.id,
@@ -216,6 +175,7 @@ def delete_fingerprint(student_id: int, db: Session = Depends(get_db)):
     student.fingerprint_template = None
 
     db.commit()
+    response_cache.invalidate("students")
 
     return {
         "success": True,
@@ -242,8 +202,8 @@ def test_current_lesson(classroom: str, db: Session = Depends(get_db)):
         "discipline": template.discipline.name,
         "classroom": lesson.classroom or template.classroom,
         "date": lesson.date.isoformat(),
-        "time_start": template.time_start,
-        "time_end": template.time_end,
+        "time_start": format_time(template.time_start),
+        "time_end": format_time(template.time_end),
         "groups": [g.name for g in template.groups],
         "current_time": current_datetime.isoformat()
     }
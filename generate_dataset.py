@@ -0,0 +1,338 @@
+import argparse
+import json
+import random
+import time as timer
+from datetime import date, time, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert, text
+
+import migrations
+from auth import get_password_hash
+from database import engine, is_sqlite_url
+from models import (Discipline, Group, LessonSlot, LessonType, ScheduleInstance, ScheduleTemplate, Semester, Student,
+                    StudentRecord, StudentStatus, TeacherDiscipline, User, UserRole, WeekType, template_groups)
+from search import normalize_name
+
+PAIRS = [
+    (time(8, 30), time(10, 0)),
+    (time(10, 10), time(11, 40)),
+    (time(12, 20), time(13, 50)),
+    (time(14, 0), time(15, 30)),
+    (time(15, 40), time(17, 10)),
+    (time(17, 20), time(18, 50)),
+]
+DAYS = range(6)
+# Semesters, past/future lessons and attendance are laid out around this date, so it is part of the seed.
+DEFAULT_TODAY = date(2024, 10, 14)
+BUILDINGS = "АБВГДЕ"
+GROUP_PREFIXES = ["ИВТ", "ПИ", "ПМИ", "ИБ", "БИ", "ФИ", "МО", "РТ"]
+BASE_DISCIPLINES = [
+    "Математический анализ", "Программирование", "Базы данных", "Алгоритмы и структуры данных",
+    "Веб-разработка", "Операционные системы", "Линейная алгебра", "Дискретная математика",
+    "Компьютерные сети", "Теория вероятностей", "Физика", "Иностранный язык",
+]
+MALE_NAMES = (
+    ["Алексеев", "Васильев", "Дмитриев", "Егоров", "Козлов", "Михайлов", "Орлов", "Романов", "Тихонов", "Смирнов",
+     "Кузнецов", "Попов", "Соколов", "Лебедев", "Новиков", "Морозов", "Волков", "Зайцев", "Павлов", "Семенов"],
+    ["Алексей", "Дмитрий", "Сергей", "Максим", "Андрей", "Павел", "Виктор", "Игорь", "Константин", "Иван",
+     "Артём", "Никита", "Михаил", "Егор", "Кирилл"],
+    ["Алексеевич", "Игоревич", "Николаевич", "Андреевич", "Владимирович", "Александрович", "Сергеевич",
+     "Дмитриевич", "Петрович", "Иванович"],
+)
+FEMALE_NAMES = (
+    ["Борисова", "Григорьева", "Жукова", "Иванова", "Лебедева", "Новикова", "Павлова", "Семенова", "Федорова",
+     "Смирнова", "Кузнецова", "Попова", "Соколова", "Морозова", "Волкова", "Зайцева", "Орлова", "Ёлкина"],
+    ["Анна", "Елена", "Ольга", "Татьяна", "Наталья", "Светлана", "Марина", "Юлия", "Анастасия", "Мария",
+     "Дарья", "Полина", "Софья", "Ксения"],
+    ["Владимировна", "Петровна", "Сергеевна", "Дмитриевна", "Игоревна", "Николаевна", "Андреевна",
+     "Александровна", "Ивановна"],
+)
+
+
+class TableWriter:
+
+    def __init__(self, connection, table, batch_size: int):
+        self.connection = connection
+        self.table = table
+        self.batch_size = batch_size
+        self.rows: List[dict] = []
+        self.count = 0
+
+    def add(self, row: dict):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.connection.execute(insert(self.table), self.rows)
+            self.connection.commit()
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def semester_periods(count: int, today: date) -> List[Tuple[str, date, date]]:
+    periods = []
+    year, autumn = today.year, today.month >= 9
+    for _ in range(count):
+        if autumn:
+            periods.append((f"Осень {year}", date(year, 9, 1), date(year, 12, 31)))
+        else:
+            periods.append((f"Весна {year}", date(year, 2, 1), date(year, 6, 30)))
+            year -= 1
+        autumn = not autumn
+    return list(reversed(periods))
+
+
+def student_name(rng: random.Random) -> str:
+    surnames, names, patronymics = rng.choice((MALE_NAMES, FEMALE_NAMES))
+    return f"{rng.choice(surnames)} {rng.choice(names)} {rng.choice(patronymics)}"
+
+
+class WeekPlanner:
+    """Hands out (day, pair, week type) slots so that groups, teachers and rooms are never double-booked."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.busy = set()
+        self.rooms: Dict[tuple, int] = {}
+
+    @staticmethod
+    def parities(week_type: WeekType):
+        return (WeekType.EVEN, WeekType.ODD) if week_type == WeekType.BOTH else (week_type,)
+
+    def is_free(self, owners, day: int, pair: int, week_type: WeekType) -> bool:
+        return all((owner, day, pair, parity) not in self.busy for owner in owners for parity in self.parities(week_type))
+
+    def book(self, owners, day: int, pair: int, week_type: WeekType):
+        for owner in owners:
+            for parity in self.parities(week_type):
+                self.busy.add((owner, day, pair, parity))
+
+    def room(self, day: int, pair: int) -> str:
+        number = self.rooms.get((day, pair), 0)
+        self.rooms[(day, pair)] = number + 1
+        return f"{BUILDINGS[number % len(BUILDINGS)]}-{101 + number // len(BUILDINGS)}"
+
+    def place(self, group_ids, teacher_candidates, week_type: WeekType):
+        slots = [(day, pair) for day in DAYS for pair in range(len(PAIRS))]
+        self.rng.shuffle(slots)
+        for day, pair in slots:
+            if not self.is_free([("group", g) for g in group_ids], day, pair, week_type):
+                continue
+            for teacher_id in teacher_candidates:
+                if self.is_free([("teacher", teacher_id)], day, pair, week_type):
+                    self.book([("group", g) for g in group_ids] + [("teacher", teacher_id)], day, pair, week_type)
+                    return day, pair, teacher_id
+        return None
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    today = args.today
+    started = timer.perf_counter()
+
+    migrations.reset(engine)
+    migrations.upgrade(engine)
+    print("✅ Таблицы созданы")
+
+    with engine.connect() as connection:
+        if is_sqlite_url(str(engine.url)):
+            connection.execute(text("PRAGMA synchronous = OFF"))
+
+        def writer(table):
+            return TableWriter(connection, table, args.batch_size)
+
+        users = writer(User.__table__)
+        users.add({"id": 1, "username": "admin", "hashed_password": get_password_hash("admin123"),
+                   "full_name": "Администратор Системы", "role": UserRole.ADMIN})
+        teacher_hash = get_password_hash("teacher123")
+        teacher_ids = list(range(2, args.teachers + 2))
+        for n, teacher_id in enumerate(teacher_ids, start=1):
+            users.add({"id": teacher_id, "username": f"teacher{n:04d}", "hashed_password": teacher_hash,
+                       "full_name": student_name(rng), "role": UserRole.TEACHER})
+        users.flush()
+
+        disciplines = writer(Discipline.__table__)
+        discipline_ids = list(range(1, args.disciplines + 1))
+        for discipline_id in discipline_ids:
+            base = BASE_DISCIPLINES[(discipline_id - 1) % len(BASE_DISCIPLINES)]
+            part = (discipline_id - 1) // len(BASE_DISCIPLINES)
+            disciplines.add({"id": discipline_id, "name": base if part == 0 else f"{base} {part + 1}"})
+        disciplines.flush()
+
+        teacher_disciplines = writer(TeacherDiscipline.__table__)
+        teachers_by_discipline: Dict[int, List[int]] = {d: [] for d in discipline_ids}
+        for n, teacher_id in enumerate(teacher_ids):
+            for discipline_id in {discipline_ids[(n + k) % len(discipline_ids)] for k in range(3)}:
+                teachers_by_discipline[discipline_id].append(teacher_id)
+        td_id = 0
+        for discipline_id, discipline_teachers in teachers_by_discipline.items():
+            for teacher_id in discipline_teachers:
+                td_id += 1
+                teacher_disciplines.add({"id": td_id, "teacher_id": teacher_id, "discipline_id": discipline_id})
+        teacher_disciplines.flush()
+
+        groups = writer(Group.__table__)
+        group_ids = list(range(1, args.groups + 1))
+        for group_id in group_ids:
+            prefix = GROUP_PREFIXES[(group_id - 1) % len(GROUP_PREFIXES)]
+            groups.add({"id": group_id, "name": f"{prefix}-{101 + (group_id - 1) // len(GROUP_PREFIXES)}"})
+        groups.flush()
+
+        students = writer(Student.__table__)
+        students_by_group: Dict[int, List[int]] = {}
+        student_id = 0
+        for group_id in group_ids:
+            students_by_group[group_id] = []
+            for _ in range(args.students_per_group):
+                student_id += 1
+                full_name = student_name(rng)
+                face = None
+                if rng.random() < args.face_coverage:
+                    face = json.dumps([round(rng.gauss(0, 0.1), 6) for _ in range(128)])
+                fingerprint = None
+                if rng.random() < args.fingerprint_coverage:
+                    fingerprint = rng.getrandbits(4096).to_bytes(512, "big").hex()
+                students.add({"id": student_id, "full_name": full_name, "search_name": normalize_name(full_name),
+                              "group_id": group_id, "face_encoding": face, "fingerprint_template": fingerprint})
+                students_by_group[group_id].append(student_id)
+        students.flush()
+        print(f"🎓 Студентов: {students.count}, групп: {groups.count}, преподавателей: {len(teacher_ids)}")
+
+        semesters = writer(Semester.__table__)
+        templates = writer(ScheduleTemplate.__table__)
+        links = writer(template_groups)
+        instances = writer(ScheduleInstance.__table__)
+        slots = writer(LessonSlot.__table__)
+        records = writer(StudentRecord.__table__)
+        template_id = instance_id = record_id = 0
+
+        periods = semester_periods(args.semesters, today)
+        for semester_id, (name, start, end) in enumerate(periods, start=1):
+            semesters.add({"id": semester_id, "name": name, "start_date": start, "end_date": end,
+                           "is_active": semester_id == len(periods)})
+            semesters.flush()
+
+            planner = WeekPlanner(rng)
+            semester_templates = []
+
+            def add_template(owner_groups, discipline_id, lesson_type, week_type):
+                nonlocal template_id
+                candidates = teachers_by_discipline[discipline_id] or teacher_ids
+                placed = planner.place(owner_groups, rng.sample(candidates, len(candidates)), week_type)
+                if placed is None:
+                    return
+                day, pair, teacher_id = placed
+                template_id += 1
+                classroom = planner.room(day, pair)
+                templates.add({
+                    "id": template_id, "semester_id": semester_id, "discipline_id": discipline_id,
+                    "classroom": classroom, "teacher_id": teacher_id,
+                    "lesson_type": lesson_type, "day_of_week": day, "time_start": PAIRS[pair][0],
+                    "time_end": PAIRS[pair][1], "week_type": week_type, "is_stream": len(owner_groups) > 1
+                })
+                for group_id in owner_groups:
+                    links.add({"schedule_template_id": template_id, "group_id": group_id})
+                semester_templates.append((template_id, day, pair, week_type, classroom, owner_groups))
+
+            for first in range(0, len(group_ids), args.stream_size):
+                stream = group_ids[first:first + args.stream_size]
+                for _ in range(args.lectures_per_stream):
+                    add_template(stream, rng.choice(discipline_ids), LessonType.LECTURE, WeekType.BOTH)
+            for group_id in group_ids:
+                for _ in range(args.templates_per_group):
+                    week_type = rng.choice([WeekType.BOTH, WeekType.BOTH, WeekType.EVEN, WeekType.ODD])
+                    lesson_type = rng.choice([LessonType.SEMINAR, LessonType.LAB])
+                    add_template([group_id], rng.choice(discipline_ids), lesson_type, week_type)
+            templates.flush()
+            links.flush()
+
+            by_day: Dict[int, list] = {}
+            for entry in semester_templates:
+                by_day.setdefault(entry[1], []).append(entry)
+
+            current_date = start
+            last_date = min(end, today + timedelta(days=14))
+            while current_date <= last_date:
+                parity = WeekType.EVEN if ((current_date - start).days // 7) % 2 == 0 else WeekType.ODD
+                is_past = current_date < today
+                for t_id, _, pair, week_type, classroom, owner_groups in by_day.get(current_date.weekday(), ()):
+                    if week_type != WeekType.BOTH and week_type != parity:
+                        continue
+                    instance_id += 1
+                    instances.add({"id": instance_id, "template_id": t_id, "semester_id": semester_id,
+                                   "date": current_date, "is_cancelled": False})
+                    slots.add({"id": instance_id, "schedule_instance_id": instance_id,
+                               "classroom": classroom, "date": current_date,
+                               "starts_at": PAIRS[pair][0], "ends_at": PAIRS[pair][1]})
+                    if not is_past or rng.random() >= args.attendance_density:
+                        continue
+                    for group_id in owner_groups:
+                        for s_id in students_by_group[group_id]:
+                            rand = rng.random()
+                            grade = None
+                            if rand < 0.7:
+                                status = StudentStatus.PRESENT
+                                if rng.random() < args.grade_rate:
+                                    grade = rng.choice((2, 3, 4, 5))
+                            elif rand < 0.85:
+                                status = StudentStatus.ABSENT
+                            else:
+                                status = StudentStatus.EXCUSED
+                            record_id += 1
+                            records.add({"id": record_id, "student_id": s_id, "schedule_instance_id": instance_id,
+                                         "status": status, "grade": grade})
+                current_date += timedelta(days=1)
+
+            instances.flush()
+            slots.flush()
+            records.flush()
+            print(f"📆 {name}: шаблонов {len(semester_templates)}, занятий {instances.count}, "
+                  f"записей {records.count} ({timer.perf_counter() - started:.1f} с)")
+
+        if connection.dialect.name == "postgresql":
+            for table in ("users", "disciplines", "teacher_disciplines", "groups", "students", "semesters",
+                          "schedule_templates", "schedule_instances", "lesson_slots", "student_records"):
+                connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+                ))
+            connection.commit()
+
+        if is_sqlite_url(str(engine.url)):
+            connection.execute(text("ANALYZE"))
+            connection.commit()
+
+    print("=" * 60)
+    print(f"🎉 Набор данных создан за {timer.perf_counter() - started:.1f} с (seed={args.seed}, today={today})")
+    print(f"   Студентов: {students.count}, шаблонов: {templates.count}, занятий: {instances.count}, "
+          f"записей о посещаемости: {records.count}")
+    print("   Вход: admin / admin123, teacher0001 / teacher123")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic journal database for load testing")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--today", type=date.fromisoformat, default=DEFAULT_TODAY,
+                        help="anchor date (YYYY-MM-DD) for semesters and attendance; pass the real date to get "
+                             "lessons happening now")
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--students-per-group", type=int, default=25)
+    parser.add_argument("--teachers", type=int, default=150)
+    parser.add_argument("--disciplines", type=int, default=60)
+    parser.add_argument("--semesters", type=int, default=2)
+    parser.add_argument("--templates-per-group", type=int, default=10)
+    parser.add_argument("--stream-size", type=int, default=3, help="groups attending the same lecture")
+    parser.add_argument("--lectures-per-stream", type=int, default=4)
+    parser.add_argument("--attendance-density", type=float, default=1.0,
+                        help="share of past lessons that have attendance records")
+    parser.add_argument("--grade-rate", type=float, default=0.5, help="share of present students who got a grade")
+    parser.add_argument("--face-coverage", type=float, default=0.5)
+    parser.add_argument("--fingerprint-coverage", type=float, default=0.3)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    generate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
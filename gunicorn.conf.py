@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+import shutil
+
+# Production profile: python migrations.py && gunicorn -c gunicorn.conf.py main:app
+
+bind = os.environ.get("BIND", "0.0.0.0:8888")
+worker_class = "uvicorn.workers.UvicornWorker"
+# Every worker loads its own copy of the dlib models (~100 MB) and starts FACE_WORKERS encoder processes.
+workers = int(os.environ.get("WEB_CONCURRENCY", min(multiprocessing.cpu_count(), 4)))
+
+# Recycle workers to cap memory growth; jitter keeps them from restarting all at once.
+max_requests = int(os.environ.get("MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 200))
+
+# Recognition and bulk enrollment requests may take tens of seconds; on SIGTERM or recycling a worker stops
+# accepting connections and gets graceful_timeout to finish them before it is killed.
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 90))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+
+accesslog = os.environ.get("ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("LOG_LEVEL", "info")
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/journal-metrics")
+
+
+def on_starting(server):
+    # Metric files of the previous run would otherwise be summed into the new one.
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,367 @@
+import csv
+import io
+import json
+import time
+import zipfile
+from datetime import time as dt_time
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from lesson_slots import parse_time
+from models import (Discipline, Group, LessonType, ScheduleTemplate, Student, User, UserRole, WeekType,
+                    template_groups)
+from schedule_conflicts import ScheduleConflictIndex, TemplateSlot, load_template_slots, to_minutes
+from search import normalize_name
+
+SUPPORTED_FORMATS = ("csv", "xlsx", "jsonl")
+MAX_REPORTED_ERRORS = 1000
+
+DAY_NAMES = {
+    "пн": 0, "понедельник": 0, "monday": 0, "mon": 0,
+    "вт": 1, "вторник": 1, "tuesday": 1, "tue": 1,
+    "ср": 2, "среда": 2, "wednesday": 2, "wed": 2,
+    "чт": 3, "четверг": 3, "thursday": 3, "thu": 3,
+    "пт": 4, "пятница": 4, "friday": 4, "fri": 4,
+    "сб": 5, "суббота": 5, "saturday": 5, "sat": 5,
+}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+# The file itself can't be read (wrong encoding, broken CSV, not an XLSX); rows after this point are lost.
+class ImportFileError(ValueError):
+
+    def __init__(self, message: str, row_number: Optional[int] = None):
+        super().__init__(message)
+        self.row_number = row_number
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    if requested:
+        fmt = requested.lower()
+    else:
+        extension = (filename or "").rsplit(".", 1)[-1].lower()
+        fmt = {"json": "jsonl", "ndjson": "jsonl"}.get(extension, extension)
+    if fmt not in SUPPORTED_FORMATS:
+        raise ValueError(f"Unsupported import format, expected one of: {', '.join(SUPPORTED_FORMATS)}")
+    return fmt
+
+
+def normalize_header(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def iter_csv_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    line_number = 0
+    try:
+        sample = text_stream.read(4096)
+        text_stream.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(text_stream, dialect)
+        header = [normalize_header(h) for h in next(reader, [])]
+        for line_number, values in enumerate(reader, start=2):
+            if any(v.strip() for v in values):
+                yield line_number, dict(zip(header, values))
+    except UnicodeDecodeError:
+        # The stream is decoded in chunks, so the failing row is not known.
+        raise ImportFileError("File is not UTF-8 encoded text")
+    except csv.Error as e:
+        raise ImportFileError(f"Malformed CSV: {e}", line_number + 1)
+
+
+def iter_xlsx_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, object]]]:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        raise ImportFileError(f"File is not a valid XLSX workbook: {e.__class__.__name__}")
+    try:
+        if workbook.active is None:
+            raise ImportFileError("Workbook has no worksheets")
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [normalize_header(h) for h in next(rows, ())]
+        for line_number, values in enumerate(rows, start=2):
+            if any(v not in (None, "") for v in values):
+                yield line_number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def iter_jsonl_rows(stream: BinaryIO) -> Iterator[Tuple[int, Dict[str, object]]]:
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ImportRowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ImportRowError("Each line must be a JSON object")
+            continue
+        yield line_number, {normalize_header(k): v for k, v in row.items()}
+
+
+def iter_rows(stream: BinaryIO, fmt: str):
+    if fmt == "csv":
+        return iter_csv_rows(stream)
+    if fmt == "xlsx":
+        return iter_xlsx_rows(stream)
+    return iter_jsonl_rows(stream)
+
+
+def cell(row: dict, *names: str, required: bool = True) -> Optional[str]:
+    for name in names:
+        value = row.get(name)
+        if value is not None and str(value).strip() != "":
+            return str(value).strip()
+    if required:
+        raise ImportRowError(f"Missing value for '{names[0]}'")
+    return None
+
+
+def cell_time(row: dict, *names: str) -> dt_time:
+    value = cell(row, *names)
+    raw = next((row[name] for name in names if isinstance(row.get(name), dt_time)), None)
+    try:
+        return parse_time(raw if raw is not None else value[:5])
+    except ValueError:
+        raise ImportRowError(f"Invalid time for '{names[0]}', expected HH:MM")
+
+
+def parse_enum(enum_cls, value: str, field: str):
+    for member in enum_cls:
+        if value == member.value or value.lower() == member.name.lower() or value.lower() == str(member.value).lower():
+            return member
+    raise ImportRowError(f"Invalid {field}: {value}")
+
+
+def parse_day_of_week(value: str) -> int:
+    if value.isdigit() and 0 <= int(value) <= 5:
+        return int(value)
+    day = DAY_NAMES.get(value.lower())
+    if day is None:
+        raise ImportRowError(f"Invalid day_of_week: {value}")
+    return day
+
+
+def split_names(value: str) -> List[str]:
+    return [part.strip() for part in value.replace(";", ",").split(",") if part.strip()]
+
+
+class ImportReport:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors: List[dict] = []
+        self.file_error: Optional[str] = None
+
+    def error(self, row_number: Optional[int], message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "processed": self.processed,
+            "imported": self.imported,
+            "failed": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+            "file_error": self.file_error,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed else None
+        }
+
+
+class BatchInserter:
+
+    def __init__(self, db: Session, report: ImportReport, flush_batch, rollback_batch=None, batch_size: int = None):
+        self.db = db
+        self.report = report
+        self.flush_batch = flush_batch
+        self.rollback_batch = rollback_batch
+        self.batch_size = batch_size or settings.import_batch_size
+        self.pending: List[Tuple[int, dict]] = []
+
+    def add(self, row_number: int, values: dict):
+        self.pending.append((row_number, values))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            self.flush_batch(batch)
+            self.db.commit()
+            self.report.imported += len(batch)
+        except Exception as e:
+            self.db.rollback()
+            # validate_row already counted these rows as taken; later rows must not be checked against them.
+            if self.rollback_batch is not None:
+                self.rollback_batch(batch)
+            for row_number, _ in batch:
+                self.report.error(row_number, f"Batch insert failed: {e.__class__.__name__}")
+
+
+def run_import(stream: BinaryIO, fmt: str, db: Session, validate_row, flush_batch, rollback_batch=None) -> dict:
+    report = ImportReport()
+    inserter = BatchInserter(db, report, flush_batch, rollback_batch)
+    try:
+        for row_number, row in iter_rows(stream, fmt):
+            report.processed += 1
+            try:
+                if isinstance(row, ImportRowError):
+                    raise row
+                inserter.add(row_number, validate_row(row_number, row))
+            except ImportRowError as e:
+                report.error(row_number, str(e))
+    except ImportFileError as e:
+        report.file_error = str(e)
+        report.error(e.row_number, str(e))
+    inserter.flush()
+    return report.as_dict()
+
+
+def import_groups(stream: BinaryIO, fmt: str, db: Session) -> dict:
+    existing = {normalize_name(name) for (name,) in db.query(Group.name)}
+
+    def validate_row(row_number, row):
+        name = cell(row, "name", "group", "группа")
+        key = normalize_name(name)
+        if key in existing:
+            raise ImportRowError(f"Group '{name}' already exists")
+        existing.add(key)
+        return {"name": name}
+
+    def flush_batch(batch):
+        db.execute(insert(Group.__table__), [values for _, values in batch])
+
+    def rollback_batch(batch):
+        existing.difference_update(normalize_name(values["name"]) for _, values in batch)
+
+    return run_import(stream, fmt, db, validate_row, flush_batch, rollback_batch)
+
+
+def import_students(stream: BinaryIO, fmt: str, db: Session) -> dict:
+    groups_by_name = {normalize_name(name): group_id for group_id, name in db.query(Group.id, Group.name)}
+    group_ids = set(groups_by_name.values())
+
+    def validate_row(row_number, row):
+        full_name = " ".join(cell(row, "full_name", "name", "фио").split())
+        group_id = cell(row, "group_id", required=False)
+        if group_id is not None:
+            if not group_id.isdigit() or int(group_id) not in group_ids:
+                raise ImportRowError(f"Unknown group_id: {group_id}")
+            group_id = int(group_id)
+        else:
+            group_name = cell(row, "group", "group_name", "группа")
+            group_id = groups_by_name.get(normalize_name(group_name))
+            if group_id is None:
+                raise ImportRowError(f"Unknown group: {group_name}")
+        return {"full_name": full_name, "search_name": normalize_name(full_name), "group_id": group_id}
+
+    def flush_batch(batch):
+        db.execute(insert(Student.__table__), [values for _, values in batch])
+
+    return run_import(stream, fmt, db, validate_row, flush_batch)
+
+
+def import_schedule_templates(stream: BinaryIO, fmt: str, db: Session, semester_id: int,
+                              allow_conflicts: bool = False) -> dict:
+    disciplines = {normalize_name(name): d_id for d_id, name in db.query(Discipline.id, Discipline.name)}
+    groups = {normalize_name(name): g_id for g_id, name in db.query(Group.id, Group.name)}
+    teachers = {}
+    for t_id, username, full_name in db.query(User.id, User.username, User.full_name).filter(User.role == UserRole.TEACHER):
+        teachers[normalize_name(username)] = t_id
+        teachers[normalize_name(full_name)] = t_id
+
+    conflict_index = ScheduleConflictIndex(semester_id)
+    for slot in load_template_slots(db, semester_id):
+        conflict_index.add(slot)
+
+    def resolve(mapping: dict, value: str, field: str) -> int:
+        resolved = mapping.get(normalize_name(value))
+        if resolved is None:
+            raise ImportRowError(f"Unknown {field}: {value}")
+        return resolved
+
+    def describe(conflict) -> str:
+        if conflict.other_template_id < 0:
+            return f"{conflict.dimension} {conflict.value} is already booked by row {-conflict.other_template_id}"
+        return conflict.describe()
+
+    def validate_row(row_number, row):
+        time_start = cell_time(row, "time_start", "start")
+        time_end = cell_time(row, "time_end", "end")
+        if time_start >= time_end:
+            raise ImportRowError("Lesson must end after it starts")
+
+        group_ids = tuple(resolve(groups, name, "group") for name in split_names(cell(row, "groups", "group")))
+        values = {
+            "semester_id": semester_id,
+            "discipline_id": resolve(disciplines, cell(row, "discipline"), "discipline"),
+            "teacher_id": resolve(teachers, cell(row, "teacher"), "teacher"),
+            "lesson_type": parse_enum(LessonType, cell(row, "lesson_type", "type"), "lesson_type"),
+            "classroom": cell(row, "classroom"),
+            "day_of_week": parse_day_of_week(cell(row, "day_of_week", "day")),
+            "time_start": time_start,
+            "time_end": time_end,
+            "week_type": parse_enum(WeekType, cell(row, "week_type", required=False) or WeekType.BOTH.value, "week_type"),
+            "is_stream": len(group_ids) > 1
+        }
+
+        slot = TemplateSlot(
+            id=-row_number,
+            classroom=values["classroom"],
+            teacher_id=values["teacher_id"],
+            group_ids=group_ids,
+            day_of_week=values["day_of_week"],
+            week_type=values["week_type"],
+            start=to_minutes(time_start),
+            end=to_minutes(time_end)
+        )
+        if not allow_conflicts:
+            conflicts = conflict_index.find_conflicts(slot)
+            if conflicts:
+                raise ImportRowError("Schedule conflict: " + "; ".join(sorted({describe(c) for c in conflicts})))
+        conflict_index.add(slot)
+        return {"template": values, "group_ids": group_ids}
+
+    def flush_batch(batch):
+        table = ScheduleTemplate.__table__
+        template_ids = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True),
+            [values["template"] for _, values in batch]
+        ).scalars().all()
+        links = [
+            {"schedule_template_id": template_id, "group_id": group_id}
+            for template_id, (_, values) in zip(template_ids, batch)
+            for group_id in values["group_ids"]
+        ]
+        if links:
+            db.execute(insert(template_groups), links)
+
+    def rollback_batch(batch):
+        for row_number, _ in batch:
+            conflict_index.remove(-row_number)
+
+    return run_import(stream, fmt, db, validate_row, flush_batch, rollback_batch)
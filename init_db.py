@@ -1,19 +1,17 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from database import Base
+from database import SessionLocal, engine
 from models import (User, Student, Group, Discipline, Semester, ScheduleTemplate, ScheduleInstance,
                     TeacherDiscipline, StudentRecord, UserRole, LessonType, StudentStatus, WeekType, DayOfWeek)
 from passlib.context import CryptContext
-from datetime import date, timedelta
+from datetime import date, time, timedelta
 import random
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./university.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+import migrations
+from lesson_slots import rebuild_lesson_slots
+from semesters import ActiveSemester, week_type_matches
 
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+migrations.reset(engine)
+migrations.upgrade(engine)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 db = SessionLocal()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -153,8 +151,8 @@ template1 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.LECTURE,
     day_of_week=DayOfWeek.MONDAY.value,
-    time_start="09:00",
-    time_end="10:30",
+    time_start=time(9, 0),
+    time_end=time(10, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -169,8 +167,8 @@ template2 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.LAB,
     day_of_week=DayOfWeek.WEDNESDAY.value,
-    time_start="11:00",
-    time_end="12:30",
+    time_start=time(11, 0),
+    time_end=time(12, 30),
     week_type=WeekType.ODD,
     is_stream=False
 )
@@ -185,8 +183,8 @@ template3 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.FRIDAY.value,
-    time_start="13:00",
-    time_end="14:30",
+    time_start=time(13, 0),
+    time_end=time(14, 30),
     week_type=WeekType.EVEN,
     is_stream=False
 )
@@ -201,8 +199,8 @@ template4 = ScheduleTemplate(
     teacher_id=teacher3.id,
     lesson_type=LessonType.LECTURE,
     day_of_week=DayOfWeek.TUESDAY.value,
-    time_start="09:00",
-    time_end="10:30",
+    time_start=time(9, 0),
+    time_end=time(10, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -217,8 +215,8 @@ template5 = ScheduleTemplate(
     teacher_id=teacher3.id,
     lesson_type=LessonType.LAB,
     day_of_week=DayOfWeek.THURSDAY.value,
-    time_start="15:00",
-    time_end="16:30",
+    time_start=time(15, 0),
+    time_end=time(16, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -233,8 +231,8 @@ template6 = ScheduleTemplate(
     teacher_id=teacher1.id,
     lesson_type=LessonType.LECTURE,
     day_of_week=DayOfWeek.WEDNESDAY.value,
-    time_start="15:00",
-    time_end="16:30",
+    time_start=time(15, 0),
+    time_end=time(16, 30),
     week_type=WeekType.EVEN,
     is_stream=False
 )
@@ -249,8 +247,8 @@ template7 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.LAB,
     day_of_week=DayOfWeek.TUESDAY.value,
-    time_start="11:00",
-    time_end="12:30",
+    time_start=time(11, 0),
+    time_end=time(12, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -265,8 +263,8 @@ template8 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.LAB,
     day_of_week=DayOfWeek.TUESDAY.value,
-    time_start="11:00",
-    time_end="12:30",
+    time_start=time(11, 0),
+    time_end=time(12, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -281,8 +279,8 @@ template9 = ScheduleTemplate(
     teacher_id=teacher1.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.FRIDAY.value,
-    time_start="13:00",
-    time_end="14:30",
+    time_start=time(13, 0),
+    time_end=time(14, 30),
     week_type=WeekType.ODD,
     is_stream=False
 )
@@ -297,8 +295,8 @@ template10 = ScheduleTemplate(
     teacher_id=teacher1.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.FRIDAY.value,
-    time_start="13:00",
-    time_end="14:30",
+    time_start=time(13, 0),
+    time_end=time(14, 30),
     week_type=WeekType.ODD,
     is_stream=False
 )
@@ -313,8 +311,8 @@ template11 = ScheduleTemplate(
     teacher_id=teacher3.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.FRIDAY.value,
-    time_start="13:00",
-    time_end="14:30",
+    time_start=time(13, 0),
+    time_end=time(14, 30),
     week_type=WeekType.ODD,
     is_stream=False
 )
@@ -329,8 +327,8 @@ template12 = ScheduleTemplate(
     teacher_id=teacher2.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.MONDAY.value,
-    time_start="12:00",
-    time_end="13:30",
+    time_start=time(12, 0),
+    time_end=time(13, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -345,8 +343,8 @@ template13 = ScheduleTemplate(
     teacher_id=teacher3.id,
     lesson_type=LessonType.SEMINAR,
     day_of_week=DayOfWeek.THURSDAY.value,
-    time_start="09:00",
-    time_end="10:30",
+    time_start=time(9, 0),
+    time_end=time(10, 30),
     week_type=WeekType.BOTH,
     is_stream=False
 )
@@ -359,29 +357,18 @@ print(f"📋 Создано {len(templates)} шаблонов расписани
 
 print("🔄 Генерация конкретных занятий из шаблонов...")
 
-def get_week_number(d, start):
-    days_diff = (d - start).days
-    return days_diff // 7
-
-def is_week_type_match(week_num, week_type):
-    if week_type == WeekType.BOTH:
-        return True
-    elif week_type == WeekType.EVEN:
-        return week_num % 2 == 0
-    else:
-        return week_num % 2 == 1
-
+active_semester = ActiveSemester.from_model(semester)
 instances_count = 0
 current_date = semester_start
 
 end_generation_date = min(today + timedelta(days=14), semester_end)
 
 while current_date <= end_generation_date:
-    week_num = get_week_number(current_date, semester_start)
+    week_type = active_semester.week_type(current_date)
     day_of_week = current_date.weekday()
 
     for template in templates:
-        if template.day_of_week == day_of_week and is_week_type_match(week_num, template.week_type):
+        if template.day_of_week == day_of_week and week_type_matches(template.week_type, week_type):
             instance = ScheduleInstance(
                 template_id=template.id,
                 semester_id=semester.id,
@@ -393,6 +380,8 @@ while current_date <= end_generation_date:
 
     current_date += timedelta(days=1)
 
+db.commit()
+rebuild_lesson_slots(db)
 db.commit()
 print(f"✅ Сгенерировано {instances_count} конкретных занятий\n")
 
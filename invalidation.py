@@ -0,0 +1,136 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from database import engine
+from models import CacheEvent
+
+logger = logging.getLogger("journal.invalidation")
+
+cache_events = CacheEvent.__table__
+
+# Postgres can commit sequence values out of order, so each poll re-reads this many ids below the high-water mark.
+POLL_LOOKBACK_IDS = 200
+PRUNE_EVERY_POLLS = 60
+
+
+def new_origin() -> str:
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+
+
+# Each worker keeps caches in memory; invalidations are broadcast to the other workers through a database table.
+class InvalidationBus:
+
+    def __init__(self, poll_seconds: float, retention_seconds: int):
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.origin = new_origin()
+        self.received = 0
+        self._handlers: Dict[str, Callable[[str], None]] = {}
+        self._last_id = 0
+        self._seen: Set[int] = set()
+        self._polls = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.poll_seconds > 0
+
+    def subscribe(self, topic: str, handler: Callable[[str], None]):
+        self._handlers[topic] = handler
+
+    def publish(self, topic: str, payload: str = "", connection=None):
+        # The caller applies the change locally. Inside a flush the event must go through the flushing
+        # connection: on SQLite a second connection would wait for the write lock that flush holds.
+        if not self.enabled:
+            return
+        statement = insert(cache_events).values(
+            topic=topic, payload=payload, origin=self.origin, created_at=datetime.utcnow()
+        )
+        if connection is not None:
+            connection.execute(statement)
+            return
+        try:
+            with engine.begin() as conn:
+                conn.execute(statement)
+        except SQLAlchemyError as e:
+            logger.error("Не удалось опубликовать событие %s: %s", topic, e)
+
+    def poll(self):
+        floor = max(self._last_id - POLL_LOOKBACK_IDS, 0)
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(cache_events.c.id, cache_events.c.topic, cache_events.c.payload, cache_events.c.origin)
+                .where(cache_events.c.id > floor)
+                .order_by(cache_events.c.id)
+            ).all()
+
+        for row in rows:
+            if row.id in self._seen:
+                continue
+            self._seen.add(row.id)
+            self._last_id = max(self._last_id, row.id)
+            if row.origin == self.origin:
+                continue
+            handler = self._handlers.get(row.topic)
+            if handler is None:
+                continue
+            try:
+                handler(row.payload)
+            except Exception:
+                logger.exception("Ошибка обработки события %s", row.topic)
+            self.received += 1
+
+        floor = self._last_id - POLL_LOOKBACK_IDS
+        self._seen = {event_id for event_id in self._seen if event_id > floor}
+
+    def prune(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        with engine.begin() as conn:
+            conn.execute(delete(cache_events).where(cache_events.c.created_at < cutoff))
+
+    def run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+                self._polls += 1
+                if self._polls % PRUNE_EVERY_POLLS == 0:
+                    self.prune()
+            except SQLAlchemyError as e:
+                logger.warning("Опрос событий инвалидации не удался: %s", e)
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        # A preloaded app is forked into every worker, so the origin is only fixed once the worker starts.
+        self.origin = new_origin()
+        with engine.connect() as conn:
+            self._last_id = conn.execute(select(func.max(cache_events.c.id))).scalar() or 0
+            self._seen = set(conn.execute(
+                select(cache_events.c.id).where(cache_events.c.id > self._last_id - POLL_LOOKBACK_IDS)
+            ).scalars())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.poll_seconds + 5)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "origin": self.origin, "last_event_id": self._last_id,
+                "received": self.received}
+
+
+invalidation_bus = InvalidationBus(settings.invalidation_poll_seconds, settings.invalidation_retention_seconds)
@@ -0,0 +1,49 @@
+from datetime import datetime, time
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session, joinedload
+
+from models import LessonSlot, ScheduleInstance
+
+TIME_FORMAT = "%H:%M"
+
+
+def parse_time(value) -> time:
+    if isinstance(value, time):
+        return value.replace(second=0, microsecond=0)
+    return datetime.strptime(str(value).strip(), TIME_FORMAT).time()
+
+
+def format_time(value: Optional[time]) -> Optional[str]:
+    return value.strftime(TIME_FORMAT) if value is not None else None
+
+
+def build_lesson_slots(instances: Iterable[ScheduleInstance]) -> List[LessonSlot]:
+    slots = []
+    for instance in instances:
+        template = instance.template
+        slots.append(LessonSlot(
+            schedule_instance_id=instance.id,
+            classroom=instance.classroom or template.classroom,
+            date=instance.date,
+            starts_at=template.time_start,
+            ends_at=template.time_end
+        ))
+    return slots
+
+
+def create_lesson_slots(db: Session, instances: Iterable[ScheduleInstance]) -> int:
+    slots = build_lesson_slots(instances)
+    db.add_all(slots)
+    return len(slots)
+
+
+def delete_lesson_slots(db: Session, instance_ids: List[int]):
+    if instance_ids:
+        db.query(LessonSlot).filter(LessonSlot.schedule_instance_id.in_(instance_ids)).delete(synchronize_session=False)
+
+
+def rebuild_lesson_slots(db: Session) -> int:
+    db.query(LessonSlot).delete(synchronize_session=False)
+    instances = db.query(ScheduleInstance).options(joinedload(ScheduleInstance.template)).all()
+    return create_lesson_slots(db, [instance for instance in instances if instance.template is not None])
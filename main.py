@@ -1,43 +1,146 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, UploadFile, File, Body
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, and_, func
-from datetime import timedelta, date
-from typing import Optional, List
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import or_, and_, func, text
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from datetime import timedelta, date, datetime, time
+from typing import Optional
+import base64
 import csv
 import io
+import json
+import logging
 import math
+import threading
+import zipfile
+from urllib.parse import quote
 
-from database import get_db, engine
-from models import (Base, User, Student, Group, Discipline, Semester, ScheduleTemplate, ScheduleInstance,
+from database import get_db, get_report_db, engine, reporting_engine, SessionLocal
+from config import settings
+from models import (User, Student, Group, Discipline, Semester, ScheduleTemplate, ScheduleInstance,
                     StudentRecord, UserRole, LessonType, StudentStatus, WeekType)
-from auth import authenticate_user, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
-from face_recognition_service import FaceRecognitionService
-from openpyxl import Workbook
+from auth import (authenticate_user_async, create_access_token, get_current_user, login_limiter, Principal,
+                  issue_refresh_token, use_refresh_token, revoke_refresh_token, revoked_sessions,
+                  ACCESS_TOKEN_EXPIRE_MINUTES)
+from face_models import FaceModelsUnavailable
+from cache import response_cache, cached_json_response
+from semesters import active_semester_provider, week_type_matches
+from search import apply_student_search
+from lesson_slots import create_lesson_slots, delete_lesson_slots, format_time, parse_time
+from schedule_conflicts import TemplateSlot, conflict_index_provider, load_template_slots, sweep_conflicts
+from compression import CompressionMiddleware
+from fast_json import FastJSONResponse
+from static_assets import PrecompressedStaticFiles, static_url
+from tracing import install_tracing
+from invalidation import invalidation_bus
+from metrics import MetricsMiddleware
+import metrics
 import fingerprint_api
+import importers
+import migrations
 
-Base.metadata.create_all(bind=engine)
+metrics.instrument_pool(engine, "primary")
+if reporting_engine is not engine:
+    metrics.instrument_pool(reporting_engine, "reporting")
 
-app = FastAPI(title="University Journal System")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with engine.connect() as connection:
+        pending = migrations.pending(connection)
+    if pending:
+        raise RuntimeError(f"Схема базы данных не обновлена ({', '.join(pending)}): выполните python migrations.py")
+
+    db = SessionLocal()
+    try:
+        revoked_sessions.load(db)
+    finally:
+        db.close()
+    invalidation_bus.start()
+    if settings.face_warmup_on_startup:
+        threading.Thread(target=warm_face_service, name="face-models-warmup", daemon=True).start()
+    yield
+    invalidation_bus.stop()
+    if face_service is not None:
+        from face_recognition_service import face_worker_pool
+        face_worker_pool.shutdown()
+    metrics.mark_process_dead()
+
+
+app = FastAPI(title="University Journal System", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+install_tracing(app)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(fingerprint_api.router)
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = static_url
 
 face_service = None
+face_service_lock = threading.Lock()
+# Set when the warm-up thread could not even build the service (e.g. dlib is missing or broken).
+face_load_error: Optional[str] = None
+face_logger = logging.getLogger("journal.faces")
 
 def get_face_service():
     global face_service
     if face_service is None:
-        from face_recognition_service import FaceRecognitionService
-        face_service = FaceRecognitionService(tolerance=0.6)
+        with face_service_lock:
+            if face_service is None:
+                from face_recognition_service import FaceRecognitionService, embedding_cache
+                face_service = FaceRecognitionService(tolerance=0.6, embedding_cache=embedding_cache)
     return face_service
 
 
+def warm_face_service():
+    global face_load_error
+    try:
+        get_face_service().warm_up()
+    except Exception as e:
+        face_logger.exception("Не удалось инициализировать распознавание лиц")
+        face_load_error = f"{e.__class__.__name__}: {e}"
+
+
+def face_models_status() -> dict:
+    status = face_service.models_status() if face_service is not None else {"state": "loading"}
+    if status["state"] == "loading" and face_load_error:
+        return {"state": "failed", "model_version": None, "error": face_load_error}
+    return status
+
+
+@app.exception_handler(FaceModelsUnavailable)
+async def face_models_unavailable_handler(request: Request, exc: FaceModelsUnavailable):
+    return JSONResponse(status_code=503, content={"detail": "Распознавание лиц недоступно: модели не загружены"})
+
+
+def database_status() -> dict:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except SQLAlchemyError as e:
+        return {"state": "failed", "error": e.__class__.__name__}
+    return {"state": "ready"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+def readiness():
+    checks = {"database": database_status()}
+    ready = checks["database"]["state"] == "ready"
+    if settings.face_warmup_on_startup:
+        checks["face_models"] = face_models_status()
+        ready = ready and checks["face_models"]["state"] in ("ready", "degraded")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks}
+    )
+
+
 MAX_PAGE_SIZE = 100
 MIN_GRADE = 2
 MAX_GRADE_ALLOWED = 5
@@ -49,9 +152,53 @@ def normalize_pagination(page: int, page_size: int):
     return page, page_size
 
 
-def apply_pagination(query, page: int, page_size: int):
+# Cursor values come from the client, so anything the column could not be compared with is rejected up front.
+CURSOR_VALUE_TYPES = {int: (int,), float: (int, float), str: (str,)}
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order_columns) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(order_columns):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    decoded = []
+    for column, value in zip(order_columns, values):
+        python_type = column.type.python_type
+        if value is not None and python_type in (date, time, datetime):
+            try:
+                value = python_type.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        elif value is not None and (
+            isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES.get(python_type, (str, int, float)))
+        ):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        decoded.append(value)
+    return decoded
+
+
+def keyset_after(order_columns, values):
+    return or_(*[
+        and_(*[order_columns[j] == values[j] for j in range(i)], order_columns[i] > values[i])
+        for i in range(len(order_columns))
+    ])
+
+
+def apply_pagination(query, page: int, page_size: int, order_columns=None,
+                     cursor: Optional[str] = None, include_total: bool = True):
+    if cursor is not None and order_columns:
+        return apply_keyset_pagination(query, order_columns, cursor, page_size, include_total)
+
     page, page_size = normalize_pagination(page, page_size)
-    total = query.count()
+    total = query.order_by(None).count()
     pages = max(1, math.ceil(total / page_size)) if total else 1
     items = query.offset((page - 1) * page_size).limit(page_size).all()
     return items, {
@@ -62,7 +209,27 @@ def apply_pagination(query, page: int, page_size: int):
     }
 
 
-def restrict_to_teacher_classes(query, current_user: User):
+def apply_keyset_pagination(query, order_columns, cursor: str, page_size: int, include_total: bool = False):
+    _, page_size = normalize_pagination(1, page_size)
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        query = query.filter(keyset_after(order_columns, decode_cursor(cursor, order_columns)))
+
+    rows = query.limit(page_size + 1).all()
+    items = rows[:page_size]
+    has_more = len(rows) > page_size
+    next_cursor = encode_cursor([getattr(items[-1], column.key) for column in order_columns]) if has_more else None
+
+    return items, {
+        "page_size": page_size,
+        "total": total,
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
+
+def restrict_to_teacher_classes(query, current_user: Principal):
     if current_user.role != UserRole.TEACHER:
         return query
     return query.filter(
@@ -116,23 +283,66 @@ async def login_page(request: Request):
 
 
 @app.post("/token")
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_limiter.retry_after(form_data.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
+        login_limiter.record_failure(form_data.username, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_limiter.reset(form_data.username)
+    refresh_token, session = await run_in_threadpool(issue_refresh_token, db, user)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=Principal.from_user(user).claims(session.id), expires_delta=access_token_expires
     )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "refresh_token": refresh_token
+    }
+
+
+@app.post("/token/refresh")
+def refresh_access_token(refresh_token: str = Form(...), db: Session = Depends(get_db)):
+    session = use_refresh_token(db, refresh_token)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(
+        data=Principal.from_user(session.user).claims(session.id),
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }
+
+
+@app.post("/token/revoke")
+def revoke_session(refresh_token: str = Form(...), db: Session = Depends(get_db)):
+    revoke_refresh_token(db, refresh_token)
+    return {"success": True}
 
 
 @app.get("/api/me")
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "username": current_user.username,
@@ -163,28 +373,34 @@ async def attendance_page(request: Request):
 
 
 @app.get("/api/groups")
-async def get_groups(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    groups = db.query(Group).all()
-    return [{"id": g.id, "name": g.name} for g in groups]
+def get_groups(request: Request, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    def load():
+        groups = db.query(Group).all()
+        return [{"id": g.id, "name": g.name} for g in groups]
+
+    return cached_json_response(request, current_user.role, ["groups"], load)
 
 
 @app.get("/api/groups/{group_id}/students")
-async def get_group_students(group_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    students = db.query(Student).filter(Student.group_id == group_id).all()
-    return [{"id": s.id, "full_name": s.full_name, "group_id": s.group_id, "group_name": s.group.name, "has_fingerprint": s.fingerprint_template is not None} for s in students]
+def get_group_students(group_id: int, request: Request, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    def load():
+        students = db.query(Student).options(joinedload(Student.group)).filter(Student.group_id == group_id).all()
+        return [{"id": s.id, "full_name": s.full_name, "group_id": s.group_id, "group_name": s.group.name, "has_fingerprint": s.fingerprint_template is not None} for s in students]
+
+    return cached_json_response(request, current_user.role, ["groups", "students"], load)
 
 
 
 @app.get("/api/schedules")
-async def get_schedules(
+def get_schedules(
     group_id: Optional[int] = None,
     discipline_name: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
-    active_semester = db.query(Semester).filter(Semester.is_active == True).first()
+    active_semester = active_semester_provider.get(db)
     if not active_semester:
-        return []
+        return FastJSONResponse([])
 
     query = db.query(ScheduleInstance).filter(ScheduleInstance.semester_id == active_semester.id)
     query = query.join(ScheduleInstance.template)
@@ -222,8 +438,8 @@ async def get_schedules(
             "teacher_id": teacher.id,
             "lesson_type": template.lesson_type.value,
             "date": str(instance.date),
-            "time_start": template.time_start,
-            "time_end": template.time_end,
+            "time_start": format_time(template.time_start),
+            "time_end": format_time(template.time_end),
             "is_stream": template.is_stream,
             "is_cancelled": instance.is_cancelled,
             "is_past": is_past,
@@ -232,16 +448,16 @@ async def get_schedules(
             "week_type": template.week_type.value
         })
 
-    return result
+    return FastJSONResponse(result)
 
 
 @app.get("/api/my-schedule")
-async def get_my_schedule(
+def get_my_schedule(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     teacher_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role not in (UserRole.TEACHER, UserRole.ADMIN):
         raise HTTPException(status_code=403, detail="Schedule available only for teachers and admins")
@@ -294,8 +510,8 @@ async def get_my_schedule(
         schedule.append({
             "id": instance.id,
             "date": str(instance.date),
-            "time_start": template.time_start,
-            "time_end": template.time_end,
+            "time_start": format_time(template.time_start),
+            "time_end": format_time(template.time_end),
             "discipline": template.discipline.name,
             "lesson_type": template.lesson_type.value,
             "classroom": classroom,
@@ -317,10 +533,10 @@ async def get_my_schedule(
 
 
 @app.get("/api/schedules/{schedule_id}")
-async def get_schedule_detail(
+def get_schedule_detail(
     schedule_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     instance = db.query(ScheduleInstance).options(
         joinedload(ScheduleInstance.template).joinedload(ScheduleTemplate.discipline),
@@ -346,8 +562,8 @@ async def get_schedule_detail(
     return {
         "id": instance.id,
         "date": str(instance.date),
-        "time_start": template.time_start,
-        "time_end": template.time_end,
+        "time_start": format_time(template.time_start),
+        "time_end": format_time(template.time_end),
         "discipline": template.discipline.name,
         "discipline_id": template.discipline_id,
         "lesson_type": template.lesson_type.value,
@@ -361,7 +577,7 @@ async def get_schedule_detail(
 
 
 @app.get("/api/schedules/{schedule_id}/records")
-async def get_schedule_records(schedule_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_schedule_records(schedule_id: int, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     instance = db.query(ScheduleInstance).filter(ScheduleInstance.id == schedule_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="Schedule not found")
@@ -396,13 +612,13 @@ async def get_schedule_records(schedule_id: int, db: Session = Depends(get_db),
 
 
 @app.post("/api/records")
-async def create_or_update_record(
+def create_or_update_record(
     student_id: int = Form(...),
     schedule_id: int = Form(...),
     status: str = Form(...),
     grade: Optional[float] = Form(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     instance = db.query(ScheduleInstance).filter(ScheduleInstance.id == schedule_id).first()
     if not instance:
@@ -453,31 +669,37 @@ async def create_or_update_record(
 
 
 @app.get("/api/disciplines")
-async def get_disciplines(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    disciplines = db.query(Discipline).all()
-    return [{"id": d.id, "name": d.name} for d in disciplines]
+def get_disciplines(request: Request, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    def load():
+        disciplines = db.query(Discipline).all()
+        return [{"id": d.id, "name": d.name} for d in disciplines]
+
+    return cached_json_response(request, current_user.role, ["disciplines"], load)
 
 
 @app.get("/api/students")
-async def get_students(
+def get_students(
     search: Optional[str] = None,
     group_id: Optional[int] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     query = db.query(Student).options(joinedload(Student.group))
 
-    if search:
-        like_pattern = f"%{search.strip()}%"
-        query = query.filter(Student.full_name.ilike(like_pattern))
-
     if group_id:
         query = query.filter(Student.group_id == group_id)
 
-    query = query.order_by(Student.full_name)
-    students, meta = apply_pagination(query, page, page_size)
+    if search and search.strip():
+        query = apply_student_search(query, db, search)
+        students, meta = apply_pagination(query, page, page_size)
+    else:
+        order_columns = [Student.full_name, Student.id]
+        query = query.order_by(*order_columns)
+        students, meta = apply_pagination(query, page, page_size, order_columns, cursor, include_total)
 
     return {
         "items": [
@@ -495,29 +717,32 @@ async def get_students(
 
 
 @app.get("/api/semesters")
-async def get_semesters(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    semesters = db.query(Semester).all()
-    return [{
-        "id": s.id,
-        "name": s.name,
-        "start_date": str(s.start_date),
-        "end_date": str(s.end_date),
-        "is_active": s.is_active
-    } for s in semesters]
+def get_semesters(request: Request, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    def load():
+        semesters = db.query(Semester).all()
+        return [{
+            "id": s.id,
+            "name": s.name,
+            "start_date": str(s.start_date),
+            "end_date": str(s.end_date),
+            "is_active": s.is_active
+        } for s in semesters]
 
+    return cached_json_response(request, current_user.role, ["semesters"], load)
 
 
-def check_admin(current_user: User):
+
+def check_admin(current_user: Principal):
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
 
 
 @app.post("/api/admin/students")
-async def create_student(
+def create_student(
     full_name: str = Form(...),
     group_id: int = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -525,15 +750,16 @@ async def create_student(
     db.add(student)
     db.commit()
     db.refresh(student)
+    response_cache.invalidate("students")
 
     return {"id": student.id, "full_name": student.full_name, "group_id": student.group_id}
 
 
 @app.delete("/api/admin/students/{student_id}")
-async def delete_student(
+def delete_student(
     student_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -543,15 +769,16 @@ async def delete_student(
 
     db.delete(student)
     db.commit()
+    response_cache.invalidate("students")
 
     return {"success": True}
 
 
 @app.post("/api/admin/groups")
-async def create_group(
+def create_group(
     name: str = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -567,15 +794,16 @@ async def create_group(
     db.add(group)
     db.commit()
     db.refresh(group)
+    response_cache.invalidate("groups")
 
     return {"id": group.id, "name": group.name}
 
 
 @app.delete("/api/admin/groups/{group_id}")
-async def delete_group(
+def delete_group(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -593,15 +821,16 @@ async def delete_group(
 
     db.delete(group)
     db.commit()
+    response_cache.invalidate("groups")
 
     return {"success": True}
 
 
 @app.post("/api/admin/disciplines")
-async def create_discipline(
+def create_discipline(
     name: str = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -617,15 +846,16 @@ async def create_discipline(
     db.add(discipline)
     db.commit()
     db.refresh(discipline)
+    response_cache.invalidate("disciplines")
 
     return {"id": discipline.id, "name": discipline.name}
 
 
 @app.delete("/api/admin/disciplines/{discipline_id}")
-async def delete_discipline(
+def delete_discipline(
     discipline_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -639,20 +869,19 @@ async def delete_discipline(
 
     db.delete(discipline)
     db.commit()
+    response_cache.invalidate("disciplines")
 
     return {"success": True}
 
 
 @app.post("/api/admin/semesters")
-async def create_semester(
-    request: Request,
+def create_semester(
+    data: dict = Body(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
-    data = await request.json()
-
     try:
         start_date = date.fromisoformat(data['start_date']) if isinstance(data['start_date'], str) else data['start_date']
         end_date = date.fromisoformat(data['end_date']) if isinstance(data['end_date'], str) else data['end_date']
@@ -674,15 +903,17 @@ async def create_semester(
     db.add(semester)
     db.commit()
     db.refresh(semester)
+    active_semester_provider.invalidate()
+    response_cache.invalidate("semesters")
 
     return {"id": semester.id, "name": semester.name, "success": True}
 
 
 @app.post("/api/admin/semesters/{semester_id}/activate")
-async def activate_semester(
+def activate_semester(
     semester_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -694,15 +925,17 @@ async def activate_semester(
 
     semester.is_active = True
     db.commit()
+    active_semester_provider.invalidate()
+    response_cache.invalidate("semesters")
 
     return {"success": True}
 
 
 @app.delete("/api/admin/semesters/{semester_id}")
-async def delete_semester(
+def delete_semester(
     semester_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -712,40 +945,64 @@ async def delete_semester(
 
     db.delete(semester)
     db.commit()
+    active_semester_provider.invalidate()
+    conflict_index_provider.invalidate()
+    response_cache.invalidate("semesters")
 
     return {"success": True}
 
 
 @app.get("/api/admin/teachers")
-async def get_teachers(
+def get_teachers(
+    request: Request,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
-    teachers = db.query(User).filter(User.role == UserRole.TEACHER).all()
-    return [{"id": t.id, "full_name": t.full_name} for t in teachers]
+    def load():
+        teachers = db.query(User).filter(User.role == UserRole.TEACHER).all()
+        return [{"id": t.id, "full_name": t.full_name} for t in teachers]
+
+    return cached_json_response(request, current_user.role, ["teachers"], load)
+
+
+@app.get("/api/admin/cache/stats")
+async def get_cache_stats(current_user: Principal = Depends(get_current_user)):
+    check_admin(current_user)
+    return {
+        **response_cache.stats(),
+        "face_embeddings": face_service.embedding_cache.stats() if face_service is not None else None,
+        "invalidation": invalidation_bus.stats()
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return metrics.metrics_response()
 
 
 @app.get("/api/admin/schedule-templates")
-async def get_schedule_templates(
+def get_schedule_templates(
     discipline_id: Optional[int] = None,
     teacher_id: Optional[int] = None,
     group_id: Optional[int] = None,
     week_type: Optional[str] = None,
     page: int = 1,
     page_size: int = 30,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
-    active_semester = db.query(Semester).filter(Semester.is_active == True).first()
+    active_semester = active_semester_provider.get(db)
     if not active_semester:
         return {"items": [], "meta": {"page": 1, "page_size": page_size, "total": 0, "pages": 1}}
 
     query = db.query(ScheduleTemplate).options(
-        joinedload(ScheduleTemplate.groups),
+        selectinload(ScheduleTemplate.groups),
         joinedload(ScheduleTemplate.discipline),
         joinedload(ScheduleTemplate.teacher)
     ).filter(ScheduleTemplate.semester_id == active_semester.id)
@@ -775,9 +1032,10 @@ async def get_schedule_templates(
                     )
                 )
 
-    query = query.order_by(ScheduleTemplate.day_of_week, ScheduleTemplate.time_start)
+    order_columns = [ScheduleTemplate.day_of_week, ScheduleTemplate.time_start, ScheduleTemplate.id]
+    query = query.order_by(*order_columns)
 
-    templates, meta = apply_pagination(query, page, page_size)
+    templates, meta = apply_pagination(query, page, page_size, order_columns, cursor, include_total)
 
     return {
         "items": [{
@@ -789,8 +1047,8 @@ async def get_schedule_templates(
             "lesson_type": t.lesson_type.value,
             "classroom": t.classroom,
             "day_of_week": t.day_of_week,
-            "time_start": t.time_start,
-            "time_end": t.time_end,
+            "time_start": format_time(t.time_start),
+            "time_end": format_time(t.time_end),
             "week_type": t.week_type.value,
             "groups": [{"id": g.id, "name": g.name} for g in t.groups]
         } for t in templates],
@@ -799,19 +1057,25 @@ async def get_schedule_templates(
 
 
 @app.post("/api/admin/schedule-templates")
-async def create_schedule_template(
-    request: Request,
+def create_schedule_template(
+    data: dict = Body(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
-    data = await request.json()
-
-    active_semester = db.query(Semester).filter(Semester.is_active == True).first()
+    active_semester = active_semester_provider.get(db)
     if not active_semester:
         raise HTTPException(status_code=400, detail="No active semester")
 
+    try:
+        time_start = parse_time(data['time_start'])
+        time_end = parse_time(data['time_end'])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid time format, expected HH:MM")
+    if time_start >= time_end:
+        raise HTTPException(status_code=400, detail="Lesson must end after it starts")
+
     template = ScheduleTemplate(
         semester_id=active_semester.id,
         discipline_id=data['discipline_id'],
@@ -819,29 +1083,57 @@ async def create_schedule_template(
         lesson_type=LessonType(data['lesson_type']),
         classroom=data['classroom'],
         day_of_week=data['day_of_week'],
-        time_start=data['time_start'],
-        time_end=data['time_end'],
+        time_start=time_start,
+        time_end=time_end,
         week_type=WeekType(data['week_type']),
         is_stream=False
     )
 
-    for group_id in data['group_ids']:
-        group = db.query(Group).filter(Group.id == group_id).first()
-        if group:
-            template.groups.append(group)
+    if data['group_ids']:
+        template.groups.extend(db.query(Group).filter(Group.id.in_(data['group_ids'])).all())
+
+    slot = TemplateSlot.from_template(template)
+    if not data.get('allow_conflicts', False):
+        conflicts = conflict_index_provider.get(db, active_semester.id).find_conflicts(slot)
+        if conflicts:
+            raise HTTPException(
+                status_code=409,
+                detail="Schedule conflict: " + "; ".join(sorted({c.describe() for c in conflicts}))
+            )
 
     db.add(template)
     db.commit()
     db.refresh(template)
+    conflict_index_provider.add(active_semester.id, slot._replace(id=template.id))
 
     return {"id": template.id, "success": True}
 
 
+@app.get("/api/admin/schedule-templates/conflicts")
+def validate_schedule_templates(
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    check_admin(current_user)
+
+    active_semester = active_semester_provider.get(db)
+    if not active_semester:
+        raise HTTPException(status_code=400, detail="No active semester")
+
+    slots = load_template_slots(db, active_semester.id)
+    conflicts = sweep_conflicts(slots)
+    return {
+        "templates_checked": len(slots),
+        "conflicts_count": len(conflicts),
+        "conflicts": [c.as_dict() for c in conflicts]
+    }
+
+
 @app.delete("/api/admin/schedule-templates/{template_id}")
-async def delete_schedule_template(
+def delete_schedule_template(
     template_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -849,53 +1141,118 @@ async def delete_schedule_template(
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
 
+    # Past instances keep their attendance; future ones would be left without a template.
+    future_instances = db.query(ScheduleInstance).filter(
+        ScheduleInstance.template_id == template_id,
+        ScheduleInstance.date >= date.today()
+    )
+    delete_lesson_slots(db, [instance_id for (instance_id,) in future_instances.with_entities(ScheduleInstance.id)])
+    future_instances.delete(synchronize_session=False)
+
     db.delete(template)
     db.commit()
+    conflict_index_provider.remove(template_id)
 
     return {"success": True}
 
 
+def read_import_format(file: UploadFile, requested: Optional[str]) -> str:
+    try:
+        return importers.detect_format(file.filename, requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def import_response(report: dict):
+    # Batches read before the file broke stay saved, so the report is returned along with the 400.
+    if report["file_error"]:
+        return JSONResponse(status_code=400, content=report)
+    return report
+
+
+@app.post("/api/admin/import/groups")
+def import_groups(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    check_admin(current_user)
+
+    report = importers.import_groups(file.file, read_import_format(file, format), db)
+    if report["imported"]:
+        response_cache.invalidate("groups")
+    return import_response(report)
+
+
+@app.post("/api/admin/import/students")
+def import_students(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    check_admin(current_user)
+
+    report = importers.import_students(file.file, read_import_format(file, format), db)
+    if report["imported"]:
+        response_cache.invalidate("students")
+    return import_response(report)
+
+
+@app.post("/api/admin/import/schedule-templates")
+def import_schedule_templates(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    allow_conflicts: bool = Form(False),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    check_admin(current_user)
+
+    active_semester = active_semester_provider.get(db)
+    if not active_semester:
+        raise HTTPException(status_code=400, detail="No active semester")
+
+    report = importers.import_schedule_templates(
+        file.file, read_import_format(file, format), db, active_semester.id, allow_conflicts
+    )
+    if report["imported"]:
+        conflict_index_provider.invalidate()
+    return import_response(report)
+
+
 @app.post("/api/admin/generate-instances")
-async def generate_schedule_instances(
+def generate_schedule_instances(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
-    active_semester = db.query(Semester).filter(Semester.is_active == True).first()
+    active_semester = active_semester_provider.get(db)
     if not active_semester:
         raise HTTPException(status_code=400, detail="No active semester")
 
-    db.query(ScheduleInstance).filter(
+    future_instances = db.query(ScheduleInstance).filter(
         ScheduleInstance.semester_id == active_semester.id,
         ScheduleInstance.date >= date.today()
-    ).delete()
+    )
+    delete_lesson_slots(db, [instance_id for (instance_id,) in future_instances.with_entities(ScheduleInstance.id)])
+    future_instances.delete(synchronize_session=False)
 
     templates = db.query(ScheduleTemplate).filter(
         ScheduleTemplate.semester_id == active_semester.id
     ).all()
 
-    def get_week_number(d, start):
-        days_diff = (d - start).days
-        return days_diff // 7
-
-    def is_week_type_match(week_num, week_type):
-        if week_type == WeekType.BOTH:
-            return True
-        elif week_type == WeekType.EVEN:
-            return week_num % 2 == 0
-        else:
-            return week_num % 2 == 1
-
-    instances_count = 0
+    new_instances = []
     current_date = date.today()
 
     while current_date <= active_semester.end_date:
-        week_num = get_week_number(current_date, active_semester.start_date)
+        week_type = active_semester.week_type(current_date)
         day_of_week = current_date.weekday()
 
         for template in templates:
-            if template.day_of_week == day_of_week and is_week_type_match(week_num, template.week_type):
+            if template.day_of_week == day_of_week and week_type_matches(template.week_type, week_type):
                 existing = db.query(ScheduleInstance).filter(
                     ScheduleInstance.template_id == template.id,
                     ScheduleInstance.date == current_date
@@ -908,19 +1265,27 @@ async def generate_schedule_instances(
                         date=current_date,
                         is_cancelled=False
                     )
+                    instance.template = template
                     db.add(instance)
-                    instances_count += 1
+                    new_instances.append(instance)
 
         current_date += timedelta(days=1)
 
+    db.flush()
+    create_lesson_slots(db, new_instances)
     db.commit()
 
-    return {"success": True, "count": instances_count}
+    return {"success": True, "count": len(new_instances)}
 
 
 
 
-def ensure_report_access(current_user: User):
+def attachment_disposition(filename: str) -> str:
+    ascii_name = filename.encode("ascii", "replace").decode().replace("?", "_")
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def ensure_report_access(current_user: Principal):
     if current_user.role not in (UserRole.ADMIN, UserRole.TEACHER):
         raise HTTPException(status_code=403, detail="Reports available for teachers and admins only")
 
@@ -949,14 +1314,14 @@ def build_report_rows(instances, students, records_map):
 
 
 @app.get("/api/reports/journal")
-async def get_journal_report(
+def get_journal_report(
     group_id: int,
     date_from: date,
     date_to: date,
     discipline_id: Optional[int] = None,
     format: str = "csv",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_report_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     ensure_report_access(current_user)
 
@@ -1005,13 +1370,15 @@ async def get_journal_report(
     filename_base = f"journal_{group.name}_{date_from}_{date_to}"
 
     if format == "json":
-        return {
+        return FastJSONResponse({
             "group": {"id": group.id, "name": group.name},
             "period": {"from": str(date_from), "to": str(date_to)},
             "rows": rows
-        }
+        })
 
     if format == "xlsx":
+        from openpyxl import Workbook
+
         workbook = Workbook()
         worksheet = workbook.active
         worksheet.title = "Журнал"
@@ -1029,7 +1396,7 @@ async def get_journal_report(
         workbook.save(stream)
         stream.seek(0)
         headers = {
-            "Content-Disposition": f"attachment; filename={filename_base}.xlsx"
+            "Content-Disposition": attachment_disposition(f"{filename_base}.xlsx")
         }
         return StreamingResponse(stream, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers=headers)
 
@@ -1047,19 +1414,19 @@ async def get_journal_report(
         ])
 
     headers = {
-        "Content-Disposition": f"attachment; filename={filename_base}.csv"
+        "Content-Disposition": attachment_disposition(f"{filename_base}.csv")
     }
     return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", headers=headers)
 
 
 @app.get("/api/reports/summary")
-async def get_summary_report(
+def get_summary_report(
     group_id: int,
     date_from: date,
     date_to: date,
     discipline_id: Optional[int] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: Session = Depends(get_report_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     ensure_report_access(current_user)
 
@@ -1175,11 +1542,11 @@ async def get_summary_report(
 
 
 @app.post("/api/students/{student_id}/upload-face")
-async def upload_student_face(
+def upload_student_face(
     student_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     check_admin(current_user)
 
@@ -1187,8 +1554,8 @@ async def upload_student_face(
     if not student:
         raise HTTPException(status_code=404, detail="Студент не найден")
 
-    image_bytes = await file.read()
-    success = get_face_service().save_student_face(student_id, image_bytes, db)
+    image_bytes = file.file.read()
+    success = get_face_service().save_student_face(student, image_bytes, db)
 
     if not success:
         raise HTTPException(status_code=400, detail="Не удалось распознать лицо на фото")
@@ -1196,12 +1563,30 @@ async def upload_student_face(
     return {"success": True, "message": f"Фото студента {student.full_name} успешно сохранено"}
 
 
+@app.post("/api/admin/students/faces/bulk")
+def bulk_upload_student_faces(
+    file: UploadFile = File(...),
+    group_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_user)
+):
+    check_admin(current_user)
+    get_face_service().require_models()
+    from face_enrollment import enroll_faces_from_zip
+    from face_recognition_service import face_worker_pool
+
+    try:
+        return enroll_faces_from_zip(file.file, db, face_worker_pool, group_id)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Файл не является ZIP-архивом")
+
+
 @app.post("/api/schedules/{schedule_id}/recognize-attendance")
-async def recognize_attendance(
+def recognize_attendance(
     schedule_id: int,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     schedule = db.query(ScheduleInstance).filter(ScheduleInstance.id == schedule_id).first()
     if not schedule:
@@ -1219,7 +1604,7 @@ async def recognize_attendance(
     if not students:
         raise HTTPException(status_code=404, detail="Студенты не найдены")
 
-    image_bytes = await file.read()
+    image_bytes = file.file.read()
     recognized_ids, total_faces = get_face_service().recognize_students(image_bytes, students)
 
     updated_count = 0
@@ -1265,10 +1650,10 @@ async def recognize_attendance(
 
 
 @app.get("/api/students/{student_id}/has-face")
-async def check_student_face(
+def check_student_face(
     student_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     student = db.query(Student).filter(Student.id == student_id).first()
     if not student:
@@ -1281,10 +1666,10 @@ async def check_student_face(
 
 
 @app.get("/api/groups/{group_id}/face-stats")
-async def get_group_face_stats(
+def get_group_face_stats(
     group_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     students = db.query(Student).filter(Student.group_id == group_id).all()
 
@@ -1302,9 +1687,9 @@ async def get_group_face_stats(
 
 
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+def get_dashboard_stats(
+    db: Session = Depends(get_report_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     from datetime import datetime, timedelta
 
@@ -1372,7 +1757,7 @@ async def get_dashboard_stats(
     top_groups = group_stats[:3]
     bottom_groups = sorted(group_stats, key=lambda x: x['attendance_rate'])[:3]
 
-    active_semester = db.query(Semester).filter(Semester.is_active == True).first()
+    active_semester = active_semester_provider.get(db)
 
     return {
         "overview": {
@@ -1394,7 +1779,9 @@ async def get_dashboard_stats(
             "id": active_semester.id,
             "name": active_semester.name,
             "start_date": str(active_semester.start_date),
-            "end_date": str(active_semester.end_date)
+            "end_date": str(active_semester.end_date),
+            "week_number": active_semester.week_number(date.today()) + 1,
+            "week_type": active_semester.week_type(date.today()).value
         } if active_semester else None
     }
 
@@ -0,0 +1,117 @@
+import os
+import time
+
+from fastapi import Response
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served", ["method"],
+    multiprocess_mode="livesum"
+)
+
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections checked out of the pool", ["engine"],
+    multiprocess_mode="livesum"
+)
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connection checkouts from the pool", ["engine"]
+)
+
+FACE_QUEUE_DEPTH = Gauge(
+    "face_inference_queue_depth", "Images waiting for or being encoded by face workers",
+    multiprocess_mode="livesum"
+)
+FACE_STAGE_DURATION = Histogram(
+    "face_stage_duration_seconds", "Time spent in each face recognition stage", ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+FACE_RECOGNITION_FACES = Counter(
+    "face_recognition_faces_total", "Faces seen by attendance recognition by outcome", ["outcome"]
+)
+
+FINGERPRINT_IDENTIFY = Counter(
+    "fingerprint_identify_total", "Fingerprint identify results per scheduled classroom", ["classroom", "result"]
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "In-process cache lookups by result", ["cache", "result"]
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def instrument_pool(engine, name: str):
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_IN_USE.labels(engine=name).inc()
+        DB_POOL_CHECKOUTS.labels(engine=name).inc()
+
+    def on_checkin(dbapi_connection, connection_record):
+        DB_POOL_IN_USE.labels(engine=name).dec()
+
+    event.listen(engine, "checkout", on_checkout)
+    event.listen(engine, "checkin", on_checkin)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method=method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            route = route_label(scope)
+            HTTP_REQUEST_DURATION.labels(method=method, route=route).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method=method, route=route, status=str(status)).inc()
+
+
+def metrics_response() -> Response:
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead():
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
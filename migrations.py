@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import inspect, text
+
+import models
+from database import Base, engine
+from lesson_slots import parse_time
+from search import create_search_index, drop_search_index, normalize_name
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def column_exists(connection, table_name: str, column_name: str) -> bool:
+    return any(c["name"] == column_name for c in inspect(connection).get_columns(table_name))
+
+
+def add_student_search_name(connection):
+    if not column_exists(connection, "students", "search_name"):
+        connection.execute(text("ALTER TABLE students ADD COLUMN search_name VARCHAR"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_students_search_name ON students (search_name)"))
+
+    rows = connection.execute(text("SELECT id, full_name FROM students")).all()
+    for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+        batch = rows[start:start + BACKFILL_BATCH_SIZE]
+        connection.execute(
+            text("UPDATE students SET search_name = :search_name WHERE id = :id"),
+            [{"id": row.id, "search_name": normalize_name(row.full_name)} for row in batch]
+        )
+
+
+def convert_template_times(connection):
+    if connection.dialect.name == "postgresql":
+        for column_name in ("time_start", "time_end"):
+            connection.execute(text(
+                f"ALTER TABLE schedule_templates ALTER COLUMN {column_name} TYPE TIME "
+                f"USING {column_name}::time"
+            ))
+        return
+
+    rows = connection.execute(text("SELECT id, time_start, time_end FROM schedule_templates")).all()
+    for row in rows:
+        connection.execute(
+            text("UPDATE schedule_templates SET time_start = :time_start, time_end = :time_end WHERE id = :id"),
+            {
+                "id": row.id,
+                "time_start": parse_time(row.time_start[:5]).strftime("%H:%M:%S.%f") if row.time_start else None,
+                "time_end": parse_time(row.time_end[:5]).strftime("%H:%M:%S.%f") if row.time_end else None
+            }
+        )
+
+
+def fill_lesson_slots(connection):
+    connection.execute(text("DELETE FROM lesson_slots"))
+    connection.execute(text(
+        "INSERT INTO lesson_slots (schedule_instance_id, classroom, date, starts_at, ends_at) "
+        "SELECT i.id, COALESCE(NULLIF(i.classroom, ''), t.classroom), i.date, t.time_start, t.time_end "
+        "FROM schedule_instances i JOIN schedule_templates t ON t.id = i.template_id"
+    ))
+
+
+def create_cache_events(connection):
+    models.CacheEvent.__table__.create(connection, checkfirst=True)
+
+
+MIGRATIONS = [
+    ("0001_student_search_name", add_student_search_name),
+    ("0002_student_search_index", create_search_index),
+    ("0003_template_time_columns", convert_template_times),
+    ("0004_lesson_slots", fill_lesson_slots),
+    ("0005_cache_events", create_cache_events),
+]
+
+
+def ensure_migrations_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR PRIMARY KEY, applied_at TIMESTAMP)"
+    ))
+
+
+def pending(connection) -> List[str]:
+    if not inspect(connection).has_table("schema_migrations"):
+        return [version for version, _ in MIGRATIONS]
+    applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+    return [version for version, _ in MIGRATIONS if version not in applied]
+
+
+def upgrade(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    applied_now = []
+    with bind.begin() as connection:
+        ensure_migrations_table(connection)
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+        for version, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.utcnow()}
+            )
+            applied_now.append(version)
+    return applied_now
+
+
+def reset(bind=engine):
+    with bind.begin() as connection:
+        drop_search_index(connection)
+        connection.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+    Base.metadata.drop_all(bind=bind)
+
+
+if __name__ == "__main__":
+    applied = upgrade()
+    print(f"Применены миграции: {', '.join(applied)}" if applied else "Схема базы данных актуальна")
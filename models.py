@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Float, Table, Enum as SQLEnum, Time
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Float, Table, Index, Enum as SQLEnum, Time
 from sqlalchemy.orm import relationship
 from database import Base
 import enum
@@ -63,6 +63,7 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String, index=True)
+    search_name = Column(String, index=True)
     face_encoding = Column(String, nullable=True)
     fingerprint_template = Column(String, nullable=True)
     group_id = Column(Integer, ForeignKey("groups.id"))
@@ -115,8 +116,8 @@ class ScheduleTemplate(Base):
     lesson_type = Column(SQLEnum(LessonType))
 
     day_of_week = Column(Integer)
-    time_start = Column(String)
-    time_end = Column(String)
+    time_start = Column(Time)
+    time_end = Column(Time)
 
     week_type = Column(SQLEnum(WeekType), default=WeekType.BOTH)
 
@@ -145,6 +146,23 @@ class ScheduleInstance(Base):
     semester = relationship("Semester", back_populates="schedule_instances")
     teacher = relationship("User", foreign_keys=[teacher_id])
     records = relationship("StudentRecord", back_populates="schedule_instance")
+    slot = relationship("LessonSlot", back_populates="instance", uselist=False)
+
+
+class LessonSlot(Base):
+    __tablename__ = "lesson_slots"
+    __table_args__ = (
+        Index("ix_lesson_slots_classroom_date_starts_at", "classroom", "date", "starts_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    schedule_instance_id = Column(Integer, ForeignKey("schedule_instances.id"), unique=True)
+    classroom = Column(String)
+    date = Column(Date)
+    starts_at = Column(Time)
+    ends_at = Column(Time)
+
+    instance = relationship("ScheduleInstance", back_populates="slot")
 
 
 class TeacherDiscipline(Base):
@@ -170,3 +188,27 @@ class StudentRecord(Base):
     student = relationship("Student", back_populates="records")
     schedule_instance = relationship("ScheduleInstance", back_populates="records")
 
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True)
+    created_at = Column(DateTime)
+    last_used_at = Column(DateTime)
+    expires_at = Column(DateTime)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+
+    user = relationship("User")
+
+
+class CacheEvent(Base):
+    __tablename__ = "cache_events"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    payload = Column(String, nullable=False, default="")
+    origin = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, index=True)
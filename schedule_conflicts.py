@@ -0,0 +1,219 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from invalidation import invalidation_bus
+from models import ScheduleTemplate, WeekType
+
+PARITIES = (WeekType.EVEN, WeekType.ODD)
+
+
+def to_minutes(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+class TemplateSlot(NamedTuple):
+    id: Optional[int]
+    classroom: str
+    teacher_id: int
+    group_ids: Tuple[int, ...]
+    day_of_week: int
+    week_type: WeekType
+    start: int
+    end: int
+
+    @classmethod
+    def from_template(cls, template: ScheduleTemplate) -> "TemplateSlot":
+        return cls(
+            id=template.id,
+            classroom=template.classroom or "",
+            teacher_id=template.teacher_id,
+            group_ids=tuple(g.id for g in template.groups),
+            day_of_week=template.day_of_week,
+            week_type=template.week_type,
+            start=to_minutes(template.time_start),
+            end=to_minutes(template.time_end)
+        )
+
+    def parities(self) -> Tuple[WeekType, ...]:
+        return PARITIES if self.week_type == WeekType.BOTH else (self.week_type,)
+
+    def keys(self) -> Iterable[tuple]:
+        for parity in self.parities():
+            # Templates without a classroom don't book a room, so they can't clash on one.
+            if self.classroom:
+                yield "classroom", self.classroom, self.day_of_week, parity
+            yield "teacher", self.teacher_id, self.day_of_week, parity
+            for group_id in self.group_ids:
+                yield "group", group_id, self.day_of_week, parity
+
+
+class Conflict(NamedTuple):
+    dimension: str
+    value: object
+    day_of_week: int
+    week_type: WeekType
+    template_id: Optional[int]
+    other_template_id: int
+
+    def as_dict(self) -> dict:
+        return {
+            "dimension": self.dimension,
+            "value": self.value,
+            "day_of_week": self.day_of_week,
+            "week_type": self.week_type.value,
+            "template_id": self.template_id,
+            "conflicts_with": self.other_template_id
+        }
+
+    def describe(self) -> str:
+        return f"{self.dimension} {self.value} is already booked by template {self.other_template_id}"
+
+
+class IntervalBucket:
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.slots: List[TemplateSlot] = []
+        self.max_ends: List[int] = []
+
+    def add(self, slot: TemplateSlot):
+        position = bisect_right(self.starts, slot.start)
+        self.starts.insert(position, slot.start)
+        self.slots.insert(position, slot)
+        self.max_ends.insert(position, 0)
+        self._refresh_max_ends(position)
+
+    def remove(self, template_id: int) -> bool:
+        for position, slot in enumerate(self.slots):
+            if slot.id == template_id:
+                del self.starts[position]
+                del self.slots[position]
+                del self.max_ends[position]
+                self._refresh_max_ends(position)
+                return True
+        return False
+
+    def _refresh_max_ends(self, position: int):
+        running = self.max_ends[position - 1] if position > 0 else 0
+        for i in range(position, len(self.slots)):
+            running = max(running, self.slots[i].end)
+            self.max_ends[i] = running
+
+    def overlapping(self, start: int, end: int) -> List[TemplateSlot]:
+        found = []
+        position = bisect_left(self.starts, end) - 1
+        while position >= 0 and self.max_ends[position] > start:
+            if self.slots[position].end > start:
+                found.append(self.slots[position])
+            position -= 1
+        return found
+
+
+class ScheduleConflictIndex:
+
+    def __init__(self, semester_id: int):
+        self.semester_id = semester_id
+        self._buckets: Dict[tuple, IntervalBucket] = {}
+        self._keys_by_template: Dict[int, List[tuple]] = {}
+
+    def add(self, slot: TemplateSlot):
+        keys = list(slot.keys())
+        for key in keys:
+            self._buckets.setdefault(key, IntervalBucket()).add(slot)
+        self._keys_by_template[slot.id] = keys
+
+    def remove(self, template_id: int):
+        for key in self._keys_by_template.pop(template_id, []):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.remove(template_id)
+                if not bucket.slots:
+                    del self._buckets[key]
+
+    def find_conflicts(self, slot: TemplateSlot) -> List[Conflict]:
+        conflicts = []
+        for key in slot.keys():
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                continue
+            dimension, value, day_of_week, parity = key
+            for other in bucket.overlapping(slot.start, slot.end):
+                if other.id != slot.id:
+                    conflicts.append(Conflict(dimension, value, day_of_week, parity, slot.id, other.id))
+        return conflicts
+
+
+def load_template_slots(db: Session, semester_id: int) -> List[TemplateSlot]:
+    templates = db.query(ScheduleTemplate).options(selectinload(ScheduleTemplate.groups)).filter(
+        ScheduleTemplate.semester_id == semester_id
+    ).all()
+    return [
+        TemplateSlot.from_template(t) for t in templates
+        if t.time_start is not None and t.time_end is not None
+    ]
+
+
+def sweep_conflicts(slots: Iterable[TemplateSlot]) -> List[Conflict]:
+    entries = sorted(
+        ((key, slot.start, slot.end, slot.id) for slot in slots for key in slot.keys()),
+        key=lambda entry: (entry[0], entry[1], entry[2])
+    )
+
+    conflicts = []
+    current_key = None
+    active: List[Tuple[int, int]] = []
+    for key, start, end, template_id in entries:
+        if key != current_key:
+            current_key = key
+            active = []
+        active = [(active_end, active_id) for active_end, active_id in active if active_end > start]
+        dimension, value, day_of_week, parity = key
+        for _, active_id in active:
+            conflicts.append(Conflict(dimension, value, day_of_week, parity, template_id, active_id))
+        active.append((end, template_id))
+    return conflicts
+
+
+class ConflictIndexProvider:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index: Optional[ScheduleConflictIndex] = None
+
+    def get(self, db: Session, semester_id: int) -> ScheduleConflictIndex:
+        with self._lock:
+            if self._index is None or self._index.semester_id != semester_id:
+                index = ScheduleConflictIndex(semester_id)
+                for slot in load_template_slots(db, semester_id):
+                    index.add(slot)
+                self._index = index
+            return self._index
+
+    # Other workers rebuild their index on the next lookup instead of replaying the change.
+    def add(self, semester_id: int, slot: TemplateSlot):
+        with self._lock:
+            if self._index is not None and self._index.semester_id == semester_id:
+                self._index.add(slot)
+        invalidation_bus.publish("conflict_index")
+
+    def remove(self, template_id: int):
+        with self._lock:
+            if self._index is not None:
+                self._index.remove(template_id)
+        invalidation_bus.publish("conflict_index")
+
+    def invalidate(self):
+        self.invalidate_local()
+        invalidation_bus.publish("conflict_index")
+
+    def invalidate_local(self):
+        with self._lock:
+            self._index = None
+
+
+conflict_index_provider = ConflictIndexProvider()
+invalidation_bus.subscribe("conflict_index", lambda _: conflict_index_provider.invalidate_local())
@@ -7,6 +7,8 @@ from models import UserRole, LessonType
 class Token(BaseModel):
     access_token: str
     token_type: str
+    expires_in: int
+    refresh_token: Optional[str] = None
 
 
 class UserCreate(BaseModel):
@@ -0,0 +1,90 @@
+import re
+from typing import List
+
+from sqlalchemy import column, event, func, literal_column, select, table, text
+from sqlalchemy.orm import Session
+
+from models import Student
+
+TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+students_fts = table("students_fts", column("rowid"), column("rank"))
+
+
+def normalize_name(value: str) -> str:
+    return " ".join((value or "").casefold().replace("ё", "е").split())
+
+
+def search_terms(value: str) -> List[str]:
+    return TERM_PATTERN.findall(normalize_name(value))
+
+
+@event.listens_for(Student, "before_insert")
+@event.listens_for(Student, "before_update")
+def sync_student_search_name(mapper, connection, target):
+    target.search_name = normalize_name(target.full_name)
+
+
+def create_search_index(connection):
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5("
+            "search_name, content='students', content_rowid='id', tokenize='unicode61')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN "
+            "INSERT INTO students_fts(rowid, search_name) VALUES (new.id, new.search_name); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN "
+            "INSERT INTO students_fts(students_fts, rowid, search_name) VALUES ('delete', old.id, old.search_name); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF search_name ON students BEGIN "
+            "INSERT INTO students_fts(students_fts, rowid, search_name) VALUES ('delete', old.id, old.search_name); "
+            "INSERT INTO students_fts(rowid, search_name) VALUES (new.id, new.search_name); END"
+        ))
+        connection.execute(text("INSERT INTO students_fts(students_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_students_search_name_trgm "
+            "ON students USING gin (search_name gin_trgm_ops)"
+        ))
+
+
+def drop_search_index(connection):
+    if connection.dialect.name == "sqlite":
+        for trigger in ("students_fts_ai", "students_fts_ad", "students_fts_au"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        connection.execute(text("DROP TABLE IF EXISTS students_fts"))
+    elif connection.dialect.name == "postgresql":
+        connection.execute(text("DROP INDEX IF EXISTS ix_students_search_name_trgm"))
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def apply_student_search(query, db: Session, search: str):
+    terms = search_terms(search)
+    if not terms:
+        return query.order_by(Student.full_name, Student.id)
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        match_expression = " ".join(f'"{term}"*' for term in terms)
+        matches = select(
+            students_fts.c.rowid.label("student_id"),
+            students_fts.c.rank.label("rank")
+        ).where(literal_column("students_fts").op("MATCH")(match_expression)).subquery()
+        return query.join(matches, matches.c.student_id == Student.id).order_by(
+            matches.c.rank, Student.full_name, Student.id
+        )
+
+    for term in terms:
+        query = query.filter(Student.search_name.like(f"%{escape_like(term)}%", escape="\\"))
+    if dialect == "postgresql":
+        return query.order_by(func.similarity(Student.search_name, " ".join(terms)).desc(), Student.full_name, Student.id)
+    return query.order_by(Student.full_name, Student.id)
@@ -0,0 +1,66 @@
+import threading
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from invalidation import invalidation_bus
+from models import Semester, WeekType
+
+def week_type_matches(template_week_type: WeekType, actual_week_type: WeekType) -> bool:
+    return template_week_type == WeekType.BOTH or template_week_type == actual_week_type
+
+
+class ActiveSemester(NamedTuple):
+    id: int
+    name: str
+    start_date: date
+    end_date: date
+    anchor_ordinal: int
+
+    @classmethod
+    def from_model(cls, semester: Semester) -> "ActiveSemester":
+        return cls(
+            id=semester.id,
+            name=semester.name,
+            start_date=semester.start_date,
+            end_date=semester.end_date,
+            anchor_ordinal=semester.start_date.toordinal()
+        )
+
+    def week_number(self, check_date: date) -> int:
+        return (check_date.toordinal() - self.anchor_ordinal) // 7
+
+    def week_type(self, check_date: date) -> WeekType:
+        return WeekType.EVEN if self.week_number(check_date) % 2 == 0 else WeekType.ODD
+
+
+class ActiveSemesterProvider:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._semester: Optional[ActiveSemester] = None
+
+    def get(self, db: Session) -> Optional[ActiveSemester]:
+        if self._loaded:
+            return self._semester
+        with self._lock:
+            if not self._loaded:
+                semester = db.query(Semester).filter(Semester.is_active == True).first()
+                self._semester = ActiveSemester.from_model(semester) if semester else None
+                self._loaded = True
+            return self._semester
+
+    def invalidate(self):
+        self.invalidate_local()
+        invalidation_bus.publish("active_semester")
+
+    def invalidate_local(self):
+        with self._lock:
+            self._loaded = False
+            self._semester = None
+
+
+active_semester_provider = ActiveSemesterProvider()
+invalidation_bus.subscribe("active_semester", lambda _: active_semester_provider.invalidate_local())
@@ -11,7 +11,7 @@ if (!token) {
 
 
 function logout() {
-    localStorage.removeItem('token');
+    endSession();
     window.location.href = '/login';
 }
 
@@ -27,7 +27,7 @@ if (!token) {
 
 
 function logout() {
-    localStorage.removeItem('token');
+    endSession();
     window.location.href = '/login';
 }
 
@@ -718,7 +718,7 @@ document.getElementById('scheduleForm').addEventListener('submit', async (e) =>
             group_ids: selectedGroups.map(id => parseInt(id))
         };
 
-        await fetch('/api/admin/schedule-templates', {
+        const response = await fetch('/api/admin/schedule-templates', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -727,6 +727,11 @@ document.getElementById('scheduleForm').addEventListener('submit', async (e) =>
             body: JSON.stringify(data)
         });
 
+        if (!response.ok) {
+            const error = await response.json().catch(() => ({}));
+            throw new Error(error.detail || 'Ошибка запроса');
+        }
+
         alertDiv.innerHTML = '<div class="alert alert-success">Занятие добавлено в расписание!</div>';
         document.getElementById('scheduleForm').reset();
         setTimeout(() => {
@@ -14,7 +14,7 @@ let scheduleInfo = null;
 let allStudents = []; 
 
 function logout() {
-    localStorage.removeItem('token');
+    endSession();
     window.location.href = '/login';
 }
 
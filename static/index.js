@@ -7,7 +7,7 @@ if (!token) {
 const DEFAULT_RANGE_DAYS = 7;
 
 function logout() {
-    localStorage.removeItem('token');
+    endSession();
     window.location.href = '/login';
 }
 
@@ -0,0 +1,74 @@
+(function () {
+    const nativeFetch = window.fetch.bind(window);
+    let refreshInFlight = null;
+
+    function withCurrentToken(options) {
+        const headers = new Headers(options && options.headers);
+        if (!headers.has('Authorization')) {
+            return null;
+        }
+        const currentToken = localStorage.getItem('token');
+        if (currentToken) {
+            headers.set('Authorization', `Bearer ${currentToken}`);
+        }
+        return { ...options, headers };
+    }
+
+    async function requestNewAccessToken() {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (!refreshToken) {
+            return false;
+        }
+
+        const response = await nativeFetch('/token/refresh', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+            body: new URLSearchParams({ refresh_token: refreshToken })
+        });
+
+        if (!response.ok) {
+            localStorage.removeItem('refresh_token');
+            return false;
+        }
+
+        const data = await response.json();
+        localStorage.setItem('token', data.access_token);
+        return true;
+    }
+
+    window.refreshAccessToken = function () {
+        if (!refreshInFlight) {
+            refreshInFlight = requestNewAccessToken()
+                .catch(() => false)
+                .finally(() => { refreshInFlight = null; });
+        }
+        return refreshInFlight;
+    };
+
+    window.fetch = async function (input, options = {}) {
+        const authorized = typeof input === 'string' ? withCurrentToken(options) : null;
+        if (!authorized) {
+            return nativeFetch(input, options);
+        }
+
+        const response = await nativeFetch(input, authorized);
+        if (response.status !== 401 || !(await window.refreshAccessToken())) {
+            return response;
+        }
+        return nativeFetch(input, withCurrentToken(options));
+    };
+
+    window.endSession = function () {
+        const refreshToken = localStorage.getItem('refresh_token');
+        localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
+        if (refreshToken) {
+            nativeFetch('/token/revoke', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+                body: new URLSearchParams({ refresh_token: refreshToken }),
+                keepalive: true
+            }).catch(() => {});
+        }
+    };
+})();
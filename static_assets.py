@@ -0,0 +1,72 @@
+import json
+import mimetypes
+import os
+from pathlib import Path
+from typing import Dict
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import negotiate_encoding
+
+STATIC_DIR = Path("static")
+STATIC_URL = "/static"
+DIST_DIR_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unhashed files keep their URL across deploys, so browsers must revalidate them (cheap with the ETag).
+REVALIDATE_CACHE_CONTROL = "no-cache"
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}
+
+
+def load_manifest(static_dir: Path = STATIC_DIR) -> Dict[str, str]:
+    try:
+        return json.loads((static_dir / DIST_DIR_NAME / MANIFEST_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+
+
+manifest = load_manifest()
+
+
+def static_url(name: str) -> str:
+    hashed = manifest.get(name)
+    if hashed is None:
+        return f"{STATIC_URL}/{name}"
+    return f"{STATIC_URL}/{DIST_DIR_NAME}/{hashed}"
+
+
+class PrecompressedStaticFiles(StaticFiles):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dist_dir = os.path.realpath(os.path.join(self.directory, DIST_DIR_NAME))
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        immutable = os.path.commonpath([self.dist_dir, os.path.realpath(full_path)]) == self.dist_dir
+
+        encoding = None
+        if immutable:
+            available = [name for name, suffix in PRECOMPRESSED.items() if os.path.isfile(f"{full_path}{suffix}")]
+            encoding = negotiate_encoding(request_headers.get("accept-encoding", ""), available)
+
+        if encoding is not None:
+            compressed_path = f"{full_path}{PRECOMPRESSED[encoding]}"
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=os.stat(compressed_path),
+                media_type=mimetypes.guess_type(str(full_path))[0] or "text/plain",
+                headers={"Content-Encoding": encoding}
+            )
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        if immutable:
+            response.headers["Vary"] = "Accept-Encoding"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,4 @@
+import os
+
+# Settings are read at import time, so the test database has to be chosen before any app module is imported.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,139 @@
+import gzip
+import zlib
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, is_compressible, negotiate_encoding, parse_accept_encoding
+
+PAYLOAD = {"rows": [{"id": i, "name": f"Студент {i}"} for i in range(200)]}
+
+
+def test_parse_accept_encoding_reads_quality_values():
+    assert parse_accept_encoding("gzip, br;q=0.8, identity;q=0, *;q=0.1") == {
+        "gzip": 1.0, "br": 0.8, "identity": 0.0, "*": 0.1
+    }
+
+
+def test_parse_accept_encoding_tolerates_garbage():
+    assert parse_accept_encoding("") == {}
+    assert parse_accept_encoding(" , ;q=1, GZIP ; q=abc, br;level=5") == {"gzip": 0.0, "br": 1.0}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0, br;q=0", None),
+    ("identity", None),
+    ("*", "br"),
+    ("*;q=0.5, br;q=0", "gzip"),
+    ("", None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_encoding_only_offers_available_variants():
+    assert negotiate_encoding("br, gzip", available=["gzip"]) == "gzip"
+    assert negotiate_encoding("br", available=[]) is None
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("application/json", True),
+    ("text/csv; charset=utf-8", True),
+    ("image/svg+xml", True),
+    ("image/png", False),
+    ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", False),
+    ("", False),
+])
+def test_is_compressible(content_type, expected):
+    assert is_compressible(content_type) is expected
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/large")
+    def large():
+        return JSONResponse(PAYLOAD, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    def small():
+        return JSONResponse({"ok": True})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"{i};Студент {i}\n" for i in range(500)), media_type="text/csv")
+
+    @app.get("/precompressed")
+    def precompressed():
+        return Response(gzip.compress(b"x" * 2000), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\x89PNG" + b"\0" * 2000, media_type="image/png")
+
+    @app.get("/not-modified")
+    def not_modified():
+        return PlainTextResponse("", status_code=304)
+
+    return TestClient(app)
+
+
+def raw_get(client, path: str, encoding: str):
+    # httpx would decode the body itself; the test checks the bytes on the wire.
+    with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("encoding, decompress", [("br", brotli.decompress), ("gzip", gzip.decompress)])
+def test_large_json_is_compressed(client, encoding, decompress):
+    response, body = raw_get(client, "/large", encoding)
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    assert response.headers["etag"] == 'W/"v1"'
+    assert decompress(body) == JSONResponse(PAYLOAD).body
+
+
+def test_identity_is_left_alone(client):
+    response, body = raw_get(client, "/large", "identity")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+    assert body == JSONResponse(PAYLOAD).body
+
+
+def test_small_body_is_sent_as_is_but_varies(client):
+    response, body = raw_get(client, "/small", "br")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == b'{"ok":true}'
+
+
+def test_streaming_response_is_compressed_incrementally(client):
+    response, body = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    expected = "".join(f"{i};Студент {i}\n" for i in range(500)).encode("utf-8")
+    assert zlib.decompress(body, 31) == expected
+
+
+@pytest.mark.parametrize("path", ["/precompressed", "/binary"])
+def test_already_encoded_and_binary_bodies_pass_through(client, path):
+    response, body = raw_get(client, path, "br")
+    assert response.headers.get("content-encoding") in (None, "gzip")
+    assert "vary" not in response.headers
+    assert int(response.headers["content-length"]) == len(body)
+
+
+def test_not_modified_passes_through(client):
+    response, body = raw_get(client, "/not-modified", "br")
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+    assert body == b""
@@ -0,0 +1,139 @@
+import io
+import zipfile
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+import importers
+from config import settings
+from database import Base, SessionLocal, engine
+from importers import ImportFileError, ImportRowError, iter_csv_rows, iter_jsonl_rows, iter_xlsx_rows, run_import
+from models import Discipline, Group, ScheduleTemplate, Semester, User, UserRole
+
+
+def csv_file(content: str, encoding: str = "utf-8") -> io.BytesIO:
+    return io.BytesIO(content.encode(encoding))
+
+
+def xlsx_file(rows) -> io.BytesIO:
+    from openpyxl import Workbook
+
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    stream = io.BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def test_csv_rows_detect_delimiter_and_skip_blank_lines():
+    rows = list(iter_csv_rows(csv_file("﻿Name;Group\nИванов Иван;ИВТ-1\n;\nПетров Петр;ИВТ-2\n")))
+    assert rows == [(2, {"name": "Иванов Иван", "group": "ИВТ-1"}), (4, {"name": "Петров Петр", "group": "ИВТ-2"})]
+
+
+def test_csv_in_legacy_encoding_is_a_file_error():
+    with pytest.raises(ImportFileError, match="UTF-8"):
+        list(iter_csv_rows(csv_file("name\nИванов Иван\n", "cp1251")))
+
+
+def test_csv_with_oversized_field_is_a_file_error():
+    content = "name,group\nok,1\n\"" + "x" * 200_000 + "\",2\n"
+    with pytest.raises(ImportFileError, match="Malformed CSV") as error:
+        list(iter_csv_rows(csv_file(content)))
+    assert error.value.row_number == 3
+
+
+def test_xlsx_rows_use_first_sheet_header():
+    rows = list(iter_xlsx_rows(xlsx_file([["Name", "Group"], ["Иванов Иван", "ИВТ-1"], [None, None]])))
+    assert rows == [(2, {"name": "Иванов Иван", "group": "ИВТ-1"})]
+
+
+def test_non_zip_xlsx_is_a_file_error():
+    with pytest.raises(ImportFileError, match="XLSX"):
+        list(iter_xlsx_rows(io.BytesIO(b"name,group\n")))
+
+
+def test_zip_without_workbook_is_a_file_error():
+    stream = io.BytesIO()
+    with zipfile.ZipFile(stream, "w") as archive:
+        archive.writestr("readme.txt", "not a workbook")
+    stream.seek(0)
+    with pytest.raises(ImportFileError, match="XLSX"):
+        list(iter_xlsx_rows(stream))
+
+
+def test_jsonl_reports_bad_lines_and_keeps_going():
+    rows = list(iter_jsonl_rows(io.BytesIO(b'{"Name": "A"}\n\n{broken\n[1, 2]\n{"name": "B"}\n')))
+    assert rows[0] == (1, {"name": "A"})
+    assert isinstance(rows[1][1], ImportRowError) and rows[1][0] == 3
+    assert isinstance(rows[2][1], ImportRowError) and rows[2][0] == 4
+    assert rows[3] == (5, {"name": "B"})
+
+
+def test_unreadable_file_is_reported_not_raised():
+    flushed = []
+    report = run_import(csv_file("name\nИванов\n", "cp1251"), "csv", None,
+                        lambda row_number, row: row, flushed.extend)
+    assert report["file_error"] == "File is not UTF-8 encoded text"
+    assert report["imported"] == 0 and report["failed"] == 1
+    assert flushed == []
+
+
+@pytest.fixture
+def db(monkeypatch):
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+def reject_on_insert(db, table: str, column: str, value: str):
+    db.execute(text(
+        f"CREATE TRIGGER reject_{table} BEFORE INSERT ON {table} WHEN NEW.{column} = '{value}' "
+        f"BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    ))
+    db.commit()
+
+
+def test_failed_batch_releases_group_names(db):
+    reject_on_insert(db, "groups", "name", "BAD")
+    report = importers.import_groups(csv_file("name\nИВТ-1\nBAD\nИВТ-1\nИВТ-2\n"), "csv", db)
+
+    assert [e["row"] for e in report["errors"]] == [2, 3]
+    assert all(e["error"].startswith("Batch insert failed") for e in report["errors"])
+    assert report["imported"] == 2
+    assert sorted(name for (name,) in db.query(Group.name)) == ["ИВТ-1", "ИВТ-2"]
+
+
+def test_failed_batch_releases_schedule_slots(db):
+    semester = Semester(name="Осень", start_date=date(2024, 9, 1), end_date=date(2024, 12, 31), is_active=True)
+    db.add_all([
+        semester,
+        Discipline(name="Физика"),
+        Group(name="ИВТ-1"),
+        Group(name="ИВТ-2"),
+        User(username="teacher", full_name="Преподаватель", role=UserRole.TEACHER, hashed_password="x"),
+        User(username="teacher2", full_name="Второй Преподаватель", role=UserRole.TEACHER, hashed_password="x"),
+    ])
+    db.commit()
+    reject_on_insert(db, "schedule_templates", "classroom", "BAD")
+
+    header = "discipline,teacher,groups,lesson_type,classroom,day_of_week,time_start,time_end\n"
+    rows = (
+        "Физика,teacher,ИВТ-1,Л,101,пн,09:00,10:30\n"
+        "Физика,teacher2,ИВТ-2,Л,BAD,пн,12:00,13:30\n"
+        "Физика,teacher,ИВТ-1,Л,101,пн,09:00,10:30\n"
+        "Физика,teacher,ИВТ-1,Л,101,пн,09:30,11:00\n"
+    )
+    report = importers.import_schedule_templates(csv_file(header + rows), "csv", db, semester.id)
+
+    assert report["imported"] == 1
+    assert [e["row"] for e in report["errors"]] == [2, 3, 5]
+    assert report["errors"][-1]["error"].startswith("Schedule conflict")
+    assert db.query(ScheduleTemplate).count() == 1
@@ -0,0 +1,93 @@
+import base64
+import json
+from datetime import date, datetime, time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table, Time, create_engine, insert, select
+
+from main import decode_cursor, encode_cursor, keyset_after
+
+metadata = MetaData()
+lessons = Table(
+    "lessons", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String),
+    Column("day", Date),
+    Column("starts_at", Time),
+)
+ORDER = [lessons.c.title, lessons.c.id]
+
+
+def raw_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip_restores_column_types():
+    columns = [lessons.c.day, lessons.c.starts_at, lessons.c.title, lessons.c.id]
+    values = [date(2024, 9, 2), time(10, 40), "Алгебра", 7]
+    assert decode_cursor(encode_cursor(values), columns) == values
+
+
+def test_cursor_keeps_null_values():
+    assert decode_cursor(encode_cursor([None, 3]), [lessons.c.day, lessons.c.id]) == [None, 3]
+
+
+def test_cursor_decodes_datetime_columns():
+    column = Column("created_at", DateTime)
+    value = datetime(2024, 9, 2, 8, 30, 15)
+    assert decode_cursor(encode_cursor([value]), [column]) == [value]
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "!!!",
+    "курсор",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode("ascii"),
+    raw_cursor({"title": "a", "id": 1}),
+    raw_cursor(["a"]),
+    raw_cursor(["a", 1, 2]),
+    raw_cursor([["a"], 1]),
+    raw_cursor(["a", {"id": 1}]),
+    raw_cursor(["a", "1"]),
+    raw_cursor(["a", True]),
+    raw_cursor([1, 1]),
+])
+def test_garbage_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, ORDER)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("value", ["2024-13-01", "yesterday", 20240901])
+def test_invalid_date_in_cursor_is_rejected(value):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(raw_cursor([value, 1]), [lessons.c.day, lessons.c.id])
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    with engine.connect() as conn:
+        titles = ["Физика", "Алгебра", "Физика", "История", "Алгебра", "Физика", "Химия"]
+        conn.execute(insert(lessons), [{"id": i + 1, "title": title} for i, title in enumerate(titles)])
+        yield conn
+
+
+def test_keyset_pages_match_full_ordering_with_duplicate_keys(connection):
+    expected = connection.execute(select(lessons.c.id).order_by(*ORDER)).scalars().all()
+
+    seen, cursor = [], None
+    while True:
+        query = select(lessons.c.title, lessons.c.id).order_by(*ORDER).limit(2)
+        if cursor is not None:
+            query = query.where(keyset_after(ORDER, decode_cursor(cursor, ORDER)))
+        page = connection.execute(query).all()
+        if not page:
+            break
+        seen.extend(row.id for row in page)
+        cursor = encode_cursor(list(page[-1]))
+
+    assert seen == expected
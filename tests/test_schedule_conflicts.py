@@ -0,0 +1,115 @@
+import random
+from itertools import combinations
+
+from models import WeekType
+from schedule_conflicts import ScheduleConflictIndex, TemplateSlot, sweep_conflicts
+
+
+def slot(template_id, start, end, classroom="101", teacher_id=1, group_ids=(1,), day_of_week=0,
+         week_type=WeekType.BOTH) -> TemplateSlot:
+    return TemplateSlot(template_id, classroom, teacher_id, tuple(group_ids), day_of_week, week_type, start, end)
+
+
+def conflict_pairs(conflicts) -> set:
+    return {(c.dimension, c.value, c.week_type, frozenset((c.template_id, c.other_template_id))) for c in conflicts}
+
+
+def brute_force_pairs(slots) -> set:
+    pairs = set()
+    for a, b in combinations(slots, 2):
+        if a.start >= b.end or b.start >= a.end:
+            continue
+        shared = set(a.keys()) & set(b.keys())
+        pairs |= {(dimension, value, parity, frozenset((a.id, b.id))) for dimension, value, _, parity in shared}
+    return pairs
+
+
+def build_index(slots) -> ScheduleConflictIndex:
+    index = ScheduleConflictIndex(semester_id=1)
+    for s in slots:
+        index.add(s)
+    return index
+
+
+def test_overlapping_lessons_in_one_classroom_conflict():
+    index = build_index([slot(1, 540, 630)])
+    conflicts = index.find_conflicts(slot(2, 600, 690, teacher_id=2, group_ids=(2,)))
+    assert [(c.dimension, c.value, c.other_template_id) for c in conflicts] == [
+        ("classroom", "101", 1), ("classroom", "101", 1)
+    ]
+    assert {c.week_type for c in conflicts} == {WeekType.EVEN, WeekType.ODD}
+
+
+def test_back_to_back_lessons_do_not_conflict():
+    index = build_index([slot(1, 540, 630)])
+    assert index.find_conflicts(slot(2, 630, 720)) == []
+    assert index.find_conflicts(slot(3, 450, 540)) == []
+
+
+def test_lessons_on_different_weeks_or_days_do_not_conflict():
+    index = build_index([slot(1, 540, 630, week_type=WeekType.EVEN)])
+    assert index.find_conflicts(slot(2, 540, 630, week_type=WeekType.ODD)) == []
+    assert index.find_conflicts(slot(3, 540, 630, day_of_week=1)) == []
+    both = index.find_conflicts(slot(4, 540, 630, classroom="102", teacher_id=2, group_ids=(2,)))
+    assert both == []
+    assert {c.week_type for c in index.find_conflicts(slot(5, 540, 630))} == {WeekType.EVEN}
+
+
+def test_teacher_and_group_are_checked_in_any_classroom():
+    index = build_index([slot(1, 540, 630, teacher_id=7, group_ids=(3, 4))])
+    conflicts = index.find_conflicts(slot(2, 560, 600, classroom="202", teacher_id=7, group_ids=(4, 5)))
+    assert {(c.dimension, c.value) for c in conflicts} == {("teacher", 7), ("group", 4)}
+
+
+def test_templates_without_classroom_do_not_share_a_room():
+    index = build_index([slot(1, 540, 630, classroom="", teacher_id=1, group_ids=(1,))])
+    assert index.find_conflicts(slot(2, 540, 630, classroom="", teacher_id=2, group_ids=(2,))) == []
+    assert sweep_conflicts([
+        slot(1, 540, 630, classroom="", teacher_id=1, group_ids=(1,)),
+        slot(2, 540, 630, classroom="", teacher_id=2, group_ids=(2,)),
+    ]) == []
+
+
+def test_removed_template_no_longer_conflicts():
+    index = build_index([slot(1, 540, 630), slot(2, 700, 790)])
+    index.remove(1)
+    assert index.find_conflicts(slot(3, 540, 630)) == []
+    assert [c.other_template_id for c in index.find_conflicts(slot(4, 720, 750))] == [2, 2, 2, 2, 2, 2]
+
+
+def test_updated_template_does_not_conflict_with_itself():
+    index = build_index([slot(1, 540, 630)])
+    assert index.find_conflicts(slot(1, 560, 650)) == []
+
+
+def random_slots(seed: int, count: int):
+    rng = random.Random(seed)
+    slots = []
+    for template_id in range(1, count + 1):
+        start = rng.randrange(480, 1140, 10)
+        slots.append(slot(
+            template_id, start, start + rng.choice((45, 90, 95, 180)),
+            classroom=rng.choice(("", "101", "102", "Б-305")),
+            teacher_id=rng.randint(1, 4),
+            group_ids=rng.sample(range(1, 6), rng.randint(1, 2)),
+            day_of_week=rng.randint(0, 1),
+            week_type=rng.choice(list(WeekType))
+        ))
+    return slots
+
+
+def test_sweep_matches_brute_force():
+    for seed in range(20):
+        slots = random_slots(seed, 40)
+        assert conflict_pairs(sweep_conflicts(slots)) == brute_force_pairs(slots)
+
+
+def test_index_matches_brute_force():
+    for seed in range(20):
+        slots = random_slots(seed, 40)
+        index = ScheduleConflictIndex(semester_id=1)
+        found = set()
+        for s in slots:
+            found |= conflict_pairs(index.find_conflicts(s))
+            index.add(s)
+        assert found == brute_force_pairs(slots)
@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper, Session
+
+from config import settings
+
+logger = logging.getLogger("journal.tracing")
+
+current_trace: ContextVar[Optional["RequestTrace"]] = ContextVar("current_trace", default=None)
+
+
+class RequestTrace:
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.statements = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        self.lazy_loads: Counter = Counter()
+        self.slowest: List[Tuple[float, str]] = []
+
+    def record_statement(self, statement: str, duration: float, rowcount: int):
+        self.statements += 1
+        self.sql_time += duration
+        if rowcount > 0:
+            self.rows += rowcount
+        if len(self.slowest) < settings.tracing_max_statements:
+            self.slowest.append((duration, statement))
+        elif duration > self.slowest[-1][0]:
+            self.slowest[-1] = (duration, statement)
+        else:
+            return
+        self.slowest.sort(key=lambda item: item[0], reverse=True)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.started
+
+    def n_plus_one_suspects(self) -> List[Tuple[str, int]]:
+        return [(path, count) for path, count in self.lazy_loads.most_common()
+                if count >= settings.tracing_n_plus_one_threshold]
+
+    def server_timing(self) -> str:
+        lazy_total = sum(self.lazy_loads.values())
+        return (
+            f'app;dur={self.duration * 1000:.1f}, '
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.statements} queries, {self.rows} rows", '
+            f'lazy;desc="{lazy_total} lazy loads"'
+        )
+
+    def slow_log_message(self) -> str:
+        lines = [
+            f"Slow request {self.method} {self.path}: {self.duration * 1000:.1f} ms, "
+            f"{self.statements} queries in {self.sql_time * 1000:.1f} ms, {self.rows} rows, "
+            f"{sum(self.lazy_loads.values())} lazy loads"
+        ]
+        for path, count in self.n_plus_one_suspects():
+            lines.append(f"  possible N+1: {path} lazy-loaded {count} times")
+        for duration, statement in self.slowest[:5]:
+            lines.append(f"  {duration * 1000:.1f} ms: {' '.join(statement.split())[:500]}")
+        return "\n".join(lines)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_trace.get() is not None:
+        conn.info.setdefault("trace_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = current_trace.get()
+    started = conn.info.get("trace_started")
+    if trace is None or not started:
+        return
+    # SELECT rows are counted as the ORM loads them; drivers disagree on rowcount for SELECT.
+    is_dml = context is not None and (context.isinsert or context.isupdate or context.isdelete)
+    trace.record_statement(statement, time.perf_counter() - started.pop(), cursor.rowcount if is_dml else 0)
+
+
+def count_loaded_row(target, context):
+    trace = current_trace.get()
+    if trace is not None:
+        trace.rows += 1
+
+
+def count_lazy_load(orm_execute_state):
+    trace = current_trace.get()
+    if trace is not None and orm_execute_state.lazy_loaded_from is not None:
+        trace.lazy_loads[str(orm_execute_state.loader_strategy_path[-1])] += 1
+
+
+def tracing_enabled() -> bool:
+    return settings.tracing_enabled or settings.slow_request_ms is not None
+
+
+def install_sql_hooks():
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(Mapper, "load", count_loaded_row)
+    event.listen(Session, "do_orm_execute", count_lazy_load)
+
+
+class TracingMiddleware:
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope["path"])
+        token = current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.tracing_enabled:
+                trace.finish()
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            trace.finish()
+            if settings.slow_request_ms is not None and trace.duration * 1000 >= settings.slow_request_ms:
+                logger.warning(trace.slow_log_message())
+
+
+def install_tracing(app):
+    if not tracing_enabled():
+        return
+    install_sql_hooks()
+    app.add_middleware(TracingMiddleware)